@@ -1,10 +1,35 @@
 # app/api/deps.py
 from typing import AsyncGenerator
+import aiohttp
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.concurrency import SingleFlight
 from app.db.database import get_session
+from app.services.executor import ChainExecutor
+from app.services.job import JobManager
 
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     """Dependency for getting async database session."""
     async for session in get_session():
         yield session
+
+
+def get_http_session(request: Request) -> aiohttp.ClientSession:
+    """Dependency for getting the pooled LangServe HTTP client."""
+    return request.app.state.http_session
+
+
+def get_chain_executor(request: Request) -> ChainExecutor:
+    """Dependency for getting the configured chain executor."""
+    return request.app.state.chain_executor
+
+
+def get_invocation_flights(request: Request) -> SingleFlight:
+    """Dependency for getting the in-flight synchronous invocations."""
+    return request.app.state.invocation_flights
+
+
+def get_job_manager(request: Request) -> JobManager:
+    """Dependency for getting the application-wide job manager."""
+    return request.app.state.job_manager
@@ -4,6 +4,7 @@ from app.api.v1.endpoints.chains import router as chains_router
 from app.api.v1.endpoints.configurations import router as configurations_router
 from app.api.v1.endpoints.questions import router as questions_router
 from app.api.v1.endpoints.answers import router as answers_router
+from app.api.v1.endpoints.jobs import router as jobs_router
 
 api_router = APIRouter()
 
@@ -12,3 +13,4 @@ api_router.include_router(chains_router)
 api_router.include_router(configurations_router)
 api_router.include_router(questions_router)
 api_router.include_router(answers_router)
+api_router.include_router(jobs_router)
@@ -11,6 +11,7 @@ from app.schemas.answer import (
     AnswerCreate,
     AnswerBulkCreate,
     AnswerDetail,
+    AnswerMetrics,
     AnswerUpdate,
 )
 from app.api.deps import get_db_session
@@ -196,6 +197,32 @@ async def get_configuration_average_score(
         )
 
 
+@router.get(
+    "/configurations/{configuration_id}/metrics",
+    response_model=AnswerMetrics,
+    responses={
+        200: {"description": "Answer metrics retrieved successfully"},
+        404: {"description": "Configuration not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def get_configuration_metrics(
+    configuration_id: UUID,
+    service: AnswerService = Depends(get_answer_service),
+) -> AnswerMetrics:
+    """Get latency and token usage aggregated over a configuration."""
+    try:
+        return await service.get_metrics_by_configuration(configuration_id)
+    except ConfigurationNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+        )
+    except AnswerError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
 @router.patch(
     "/questions/{question_id}/answers/{answer_id}",
     response_model=AnswerDetail,
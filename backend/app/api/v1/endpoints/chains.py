@@ -1,9 +1,36 @@
-from typing import List
+import asyncio
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
+from sse_starlette.sse import EventSourceResponse
 
+from app.core.concurrency import (
+    FlightCancelledError,
+    Priority,
+    SingleFlight,
+)
+from app.core.http import json_dumps
 from app.core.logger import get_logger
+from app.db.config import AsyncSessionLocal
+from app.models.answer import Answer
 from app.models.chain import Chain
 from app.schemas.chain import (
     Chain as ChainSchema,
@@ -11,23 +38,65 @@ from app.schemas.chain import (
     ChainSelection,
 )
 from app.schemas.answer import Answer as AnswerSchema
-from app.api.deps import get_db_session
-from app.services.chain import ChainService
+from app.schemas.job import JobProgress
+from app.api.deps import (
+    get_chain_executor,
+    get_db_session,
+    get_invocation_flights,
+)
+from app.services.chain import ChainService, InvocationProgress
+from app.services.executor import ChainExecutor
 from app.services.exceptions import (
     ChainError,
     ChainNotFoundError,
+    ChainUnavailableError,
     SessionNotFoundError,
     ConfigurationNotFoundError,
+    QuestionError,
+    QuestionNotFoundError,
 )
 
 router = APIRouter(tags=["chains"])
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+# Non-standard status for requests the client abandoned, as used by nginx
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
 
 async def get_session_service(
     db: AsyncSession = Depends(get_db_session),
+    executor: ChainExecutor = Depends(get_chain_executor),
 ) -> ChainService:
-    return ChainService(Chain, db)
+    return ChainService(Chain, db, executor)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, cancelling it when the client disconnects."""
+    task = asyncio.ensure_future(awaitable)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait(
+            {task, disconnect}, return_when=asyncio.FIRST_COMPLETED
+        )
+        if not task.done():
+            logger.info(f"Client disconnected from '{request.url.path}'")
+            raise HTTPException(
+                status_code=HTTP_499_CLIENT_CLOSED_REQUEST,
+                detail="Client closed request",
+            )
+        return task.result()
+    finally:
+        disconnect.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
 
 @router.get(
@@ -45,7 +114,10 @@ async def get_available_chains(
     """Get all available chain files from backend/chains directory."""
     try:
         chain_files = await service.get_available_chains()
-        return [AvailableChain(file_name=path) for path in chain_files]
+        return [
+            AvailableChain(file_name=path, content_hash=content_hash)
+            for path, content_hash in chain_files.items()
+        ]
     except ChainError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -98,25 +170,202 @@ async def select_chains(
     responses={
         200: {"description": "Chain invoked successfully"},
         404: {"description": "Chain or configuration not found"},
+        409: {"description": "Invocation was cancelled"},
         500: {"description": "Internal server error"},
+        503: {"description": "LangServe upstream unavailable"},
     },
 )
 async def invoke_chain(
     session_id: UUID,
     chain_id: UUID,
     config_id: UUID,
+    request: Request,
+    response: Response,
+    chunk_size: Optional[int] = Query(
+        None, ge=1, description="Questions sent per LangServe batch request"
+    ),
+    max_concurrency: Optional[int] = Query(
+        None, ge=1, description="LangServe batch requests in flight at once"
+    ),
+    question_ids: Optional[List[UUID]] = Query(
+        None, description="Only invoke the chain for these questions"
+    ),
+    missing_only: bool = Query(
+        False, description="Only generate questions that have no answer yet"
+    ),
+    use_cache: bool = Query(
+        True,
+        description="Reuse cached answers; disable for non-deterministic runs",
+    ),
+    priority: Optional[Priority] = Query(
+        None,
+        description="Scheduling class, interactive for small invocations "
+        "and bulk otherwise by default",
+    ),
     service: ChainService = Depends(get_session_service),
+    executor: ChainExecutor = Depends(get_chain_executor),
+    flights: SingleFlight = Depends(get_invocation_flights),
 ) -> List[AnswerSchema]:
-    """Invoke chain with configuration for all session questions."""
+    """
+    Invoke chain with configuration for all session questions. A duplicate
+    of an invocation still in flight waits for it and gets its answers.
+    The invocation is cancelled once every client waiting for it has
+    disconnected, keeping the answers saved so far.
+    """
     try:
-        answers = await service.invoke_chain_batch(
+        await service.validate_invocation(
             session_id=session_id, chain_id=chain_id, config_id=config_id
         )
+        question_set = await service.get_question_set_hash(
+            session_id, question_ids
+        )
+
+        async def invoke() -> Tuple[List[Answer], InvocationProgress]:
+            # Shared by all callers, so not tied to this request's session
+            async with AsyncSessionLocal() as db:
+                progress = InvocationProgress()
+                answers = await ChainService(
+                    Chain, db, executor
+                ).invoke_chain_batch(
+                    session_id=session_id,
+                    chain_id=chain_id,
+                    config_id=config_id,
+                    chunk_size=chunk_size,
+                    max_concurrency=max_concurrency,
+                    question_ids=question_ids,
+                    missing_only=missing_only,
+                    use_cache=use_cache,
+                    priority=priority,
+                    progress=progress,
+                )
+                return answers, progress
+
+        (answers, progress), shared = await cancel_on_disconnect(
+            request,
+            flights.do(
+                (
+                    session_id,
+                    chain_id,
+                    config_id,
+                    question_set,
+                    missing_only,
+                    use_cache,
+                ),
+                invoke,
+            ),
+        )
+        response.headers["X-Answer-Cache-Hits"] = str(progress.cache_hits)
+        response.headers["X-Answer-Cache-Misses"] = str(progress.cache_misses)
+        response.headers["X-Invocation-Shared"] = str(shared).lower()
         return [AnswerSchema.model_validate(answer) for answer in answers]
     except (
         SessionNotFoundError,
         ChainNotFoundError,
         ConfigurationNotFoundError,
+        QuestionNotFoundError,
+    ) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except FlightCancelledError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Invocation was cancelled, answers saved so far are kept",
+        )
+    except ChainUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+        )
+    except (ChainError, QuestionError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+
+@router.post(
+    "/sessions/{session_id}/chains/{chain_id}/configuration/{config_id}/invoke/cancel",
+    response_model=int,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"description": "Number of invocations cancelled"},
+    },
+)
+async def cancel_chain_invocations(
+    session_id: UUID,
+    chain_id: UUID,
+    config_id: UUID,
+    flights: SingleFlight = Depends(get_invocation_flights),
+) -> int:
+    """
+    Cancel the invocations of a chain with a configuration that are in
+    flight, keeping the answers they already saved. Use the jobs API to
+    cancel background jobs.
+    """
+    cancelled = flights.cancel(
+        lambda key: key[:3] == (session_id, chain_id, config_id)
+    )
+    logger.info(
+        f"Cancelled {cancelled} invocations of chain '{chain_id}' and "
+        f"configuration '{config_id}'"
+    )
+    return cancelled
+
+
+@router.get(
+    "/sessions/{session_id}/chains/{chain_id}/configuration/{config_id}/stream",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Server-sent events with tokens and saved answers",
+            "content": {"text/event-stream": {}},
+        },
+        404: {"description": "Chain or configuration not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def stream_chain(
+    session_id: UUID,
+    chain_id: UUID,
+    config_id: UUID,
+    max_concurrency: Optional[int] = Query(
+        None, ge=1, description="Questions streamed from LangServe at once"
+    ),
+    question_ids: Optional[List[UUID]] = Query(
+        None, description="Only invoke the chain for these questions"
+    ),
+    missing_only: bool = Query(
+        False, description="Only generate questions that have no answer yet"
+    ),
+    use_cache: bool = Query(
+        True,
+        description="Reuse cached answers; disable for non-deterministic runs",
+    ),
+    priority: Optional[Priority] = Query(
+        None,
+        description="Scheduling class, interactive for small invocations "
+        "and bulk otherwise by default",
+    ),
+    service: ChainService = Depends(get_session_service),
+    executor: ChainExecutor = Depends(get_chain_executor),
+) -> EventSourceResponse:
+    """
+    Invoke chain with configuration for all session questions and stream
+    `token`, `answer` and `error` events as they are produced, followed by
+    a final `done` event with the progress counters. Disconnecting cancels
+    the questions still being generated.
+    """
+    try:
+        await service.validate_invocation(
+            session_id=session_id, chain_id=chain_id, config_id=config_id
+        )
+    except (
+        SessionNotFoundError,
+        ChainNotFoundError,
+        ConfigurationNotFoundError,
+        QuestionNotFoundError,
     ) as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -128,6 +377,36 @@ async def invoke_chain(
             detail=str(e),
         )
 
+    async def event_stream() -> AsyncIterator[Dict[str, Any]]:
+        # The request's database session is closed once streaming starts
+        async with AsyncSessionLocal() as db:
+            stream_service = ChainService(Chain, db, executor)
+            try:
+                async for event, data in stream_service.stream_chain_batch(
+                    session_id=session_id,
+                    chain_id=chain_id,
+                    config_id=config_id,
+                    max_concurrency=max_concurrency,
+                    question_ids=question_ids,
+                    missing_only=missing_only,
+                    use_cache=use_cache,
+                    priority=priority,
+                ):
+                    if event == "answer":
+                        data = AnswerSchema.model_validate(data).model_dump(
+                            mode="json"
+                        )
+                    elif event == "done":
+                        data = JobProgress.model_validate(data).model_dump()
+                    yield {"event": event, "data": json_dumps(data)}
+            except (ChainError, QuestionError) as e:
+                yield {
+                    "event": "error",
+                    "data": json_dumps({"detail": str(e)}),
+                }
+
+    return EventSourceResponse(event_stream())
+
 
 @router.get(
     "/sessions/{session_id}/chains",
@@ -1,5 +1,6 @@
 from typing import List
 from uuid import UUID
+import aiohttp
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -11,7 +12,7 @@ from app.schemas.configuration import (
     ConfigurationUpdate,
     ConfigSchema,
 )
-from app.api.deps import get_db_session
+from app.api.deps import get_db_session, get_http_session
 from app.services.configuration import ConfigurationService
 from app.services.exceptions import (
     SessionNotFoundError,
@@ -29,8 +30,9 @@ logger = get_logger(__name__)
 
 async def get_configuration_service(
     db: AsyncSession = Depends(get_db_session),
+    http: aiohttp.ClientSession = Depends(get_http_session),
 ) -> ConfigurationService:
-    return ConfigurationService(Configuration, db)
+    return ConfigurationService(Configuration, db, http)
 
 
 @router.get(
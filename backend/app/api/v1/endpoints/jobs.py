@@ -0,0 +1,270 @@
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logger import get_logger
+from app.models.chain import Chain
+from app.schemas.job import Job as JobSchema
+from app.api.deps import (
+    get_chain_executor,
+    get_db_session,
+    get_job_manager,
+)
+from app.services.chain import ChainService
+from app.services.executor import ChainExecutor
+from app.services.job import JobManager
+from app.services.exceptions import (
+    ChainError,
+    ChainNotFoundError,
+    SessionNotFoundError,
+    ConfigurationNotFoundError,
+    JobError,
+    JobNotFoundError,
+    QuestionError,
+    QuestionNotFoundError,
+)
+
+router = APIRouter(tags=["jobs"])
+logger = get_logger(__name__)
+
+
+async def get_chain_service(
+    db: AsyncSession = Depends(get_db_session),
+    executor: ChainExecutor = Depends(get_chain_executor),
+) -> ChainService:
+    return ChainService(Chain, db, executor)
+
+
+@router.post(
+    "/sessions/{session_id}/chains/{chain_id}/configuration/{config_id}/jobs",
+    response_model=JobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Chain invocation job queued"},
+        404: {"description": "Chain or configuration not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def submit_invocation_job(
+    session_id: UUID,
+    chain_id: UUID,
+    config_id: UUID,
+    chunk_size: Optional[int] = Query(
+        None, ge=1, description="Questions sent per LangServe batch request"
+    ),
+    max_concurrency: Optional[int] = Query(
+        None, ge=1, description="LangServe batch requests in flight at once"
+    ),
+    question_ids: Optional[List[UUID]] = Query(
+        None, description="Only invoke the chain for these questions"
+    ),
+    missing_only: bool = Query(
+        False, description="Only generate questions that have no answer yet"
+    ),
+    use_cache: bool = Query(
+        True,
+        description="Reuse cached answers; disable for non-deterministic runs",
+    ),
+    service: ChainService = Depends(get_chain_service),
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobSchema:
+    """
+    Queue a chain invocation for all session questions and return its job.
+    A duplicate of a pending or running job returns that job instead.
+    """
+    try:
+        await service.validate_invocation(
+            session_id=session_id, chain_id=chain_id, config_id=config_id
+        )
+        question_set = await service.get_question_set_hash(
+            session_id, question_ids
+        )
+        job = job_manager.submit(
+            session_id=session_id,
+            chain_id=chain_id,
+            config_id=config_id,
+            options={
+                "chunk_size": chunk_size,
+                "max_concurrency": max_concurrency,
+                "question_ids": question_ids,
+                "missing_only": missing_only,
+                "use_cache": use_cache,
+            },
+            question_set=question_set,
+        )
+        return JobSchema.model_validate(job)
+    except (
+        SessionNotFoundError,
+        ChainNotFoundError,
+        ConfigurationNotFoundError,
+        QuestionNotFoundError,
+    ) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+        )
+    except (ChainError, QuestionError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/sessions/{session_id}/matrix/jobs",
+    response_model=JobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Evaluation matrix job queued"},
+        400: {"description": "Session has no chain configurations"},
+        404: {"description": "Session not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def submit_matrix_job(
+    session_id: UUID,
+    chunk_size: Optional[int] = Query(
+        None, ge=1, description="Questions sent per LangServe batch request"
+    ),
+    max_concurrency: Optional[int] = Query(
+        None,
+        ge=1,
+        description="LangServe batch requests in flight across all cells",
+    ),
+    question_ids: Optional[List[UUID]] = Query(
+        None, description="Only invoke the chain for these questions"
+    ),
+    missing_only: bool = Query(
+        False, description="Only generate questions that have no answer yet"
+    ),
+    use_cache: bool = Query(
+        True,
+        description="Reuse cached answers; disable for non-deterministic runs",
+    ),
+    service: ChainService = Depends(get_chain_service),
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobSchema:
+    """Queue all configurations of all session chains as one matrix job."""
+    try:
+        matrix = await service.get_evaluation_matrix(session_id)
+        if not matrix:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Session '{session_id}' has no chain configurations",
+            )
+        question_set = await service.get_question_set_hash(
+            session_id, question_ids
+        )
+        job = job_manager.submit_matrix(
+            session_id=session_id,
+            cells=[(chain.id, config.id) for chain, config in matrix],
+            options={
+                "chunk_size": chunk_size,
+                "max_concurrency": max_concurrency,
+                "question_ids": question_ids,
+                "missing_only": missing_only,
+                "use_cache": use_cache,
+            },
+            question_set=question_set,
+        )
+        return JobSchema.model_validate(job)
+    except (SessionNotFoundError, QuestionNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+        )
+    except (ChainError, QuestionError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/jobs",
+    response_model=List[JobSchema],
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"description": "Jobs retrieved successfully"},
+    },
+)
+async def list_jobs(
+    session_id: Optional[UUID] = None,
+    job_manager: JobManager = Depends(get_job_manager),
+) -> List[JobSchema]:
+    """List known invocation jobs, optionally filtered by session."""
+    jobs = job_manager.list_jobs(session_id=session_id)
+    return [JobSchema.model_validate(job) for job in jobs]
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobSchema,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"description": "Job retrieved successfully"},
+        404: {"description": "Job not found"},
+    },
+)
+async def get_job(
+    job_id: UUID,
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobSchema:
+    """Get status, progress and errors of an invocation job."""
+    try:
+        return JobSchema.model_validate(job_manager.get_job(job_id))
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+        )
+
+
+@router.post(
+    "/jobs/{job_id}/resume",
+    response_model=JobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Resumed invocation job queued"},
+        404: {"description": "Job not found"},
+        409: {"description": "Job is still running"},
+    },
+)
+async def resume_job(
+    job_id: UUID,
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobSchema:
+    """Queue a new job generating only the answers an earlier job missed."""
+    try:
+        return JobSchema.model_validate(job_manager.resume(job_id))
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+        )
+    except JobError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(e)
+        )
+
+
+@router.post(
+    "/jobs/{job_id}/cancel",
+    response_model=JobSchema,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"description": "Job cancelled"},
+        404: {"description": "Job not found"},
+        409: {"description": "Job has already finished"},
+    },
+)
+async def cancel_job(
+    job_id: UUID,
+    job_manager: JobManager = Depends(get_job_manager),
+) -> JobSchema:
+    """Cancel a pending or running job, keeping the answers it saved."""
+    try:
+        return JobSchema.model_validate(job_manager.cancel(job_id))
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+        )
+    except JobError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(e)
+        )
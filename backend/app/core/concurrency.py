@@ -0,0 +1,418 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import Enum
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from app.core.config import (
+    ADAPTIVE_CONCURRENCY_INITIAL,
+    ADAPTIVE_CONCURRENCY_MAX,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    SCHEDULER_CAPACITY,
+    SCHEDULER_INTERACTIVE_RESERVED,
+)
+
+
+class FairSemaphore:
+    """
+    Semaphore that hands free slots to waiting keys in round-robin order.
+
+    Waiters are queued per key (e.g. per chain), and every released slot goes
+    to the next key in rotation, so one key with many queued requests can't
+    starve the others.
+    """
+
+    def __init__(self, value: int):
+        if value < 1:
+            raise ValueError("FairSemaphore value must be at least 1")
+        self._value = value
+        self._waiters: OrderedDict[Hashable, Deque[asyncio.Future]] = (
+            OrderedDict()
+        )
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold one slot on behalf of `key` for the duration of the block."""
+        await self._acquire(key)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, key: Hashable) -> None:
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was already handed over, pass it on
+                self._release()
+            else:
+                queue = self._waiters.get(key)
+                if queue and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiters[key]
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            key, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class Priority(str, Enum):
+    """Scheduling classes of chain executions, most urgent first"""
+
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+
+class PriorityScheduler:
+    """
+    Shares chain execution slots between priority classes.
+
+    Interactive requests may use every slot and are served before waiting
+    bulk requests, while bulk requests can't use the `reserved` slots, so a
+    large sweep never holds all capacity. Bulk invocations take a slot per
+    chunk, which makes them yield to interactive requests at chunk
+    boundaries.
+    """
+
+    def __init__(self, *, capacity: int, reserved: int):
+        if capacity < 2:
+            raise ValueError("PriorityScheduler capacity must be at least 2")
+        self.capacity = capacity
+        self.reserved = min(max(reserved, 0), capacity - 1)
+        self.in_use: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._waiters: Dict[Priority, Deque[asyncio.Future]] = {
+            p: deque() for p in Priority
+        }
+
+    @property
+    def waiting(self) -> Dict[Priority, int]:
+        return {p: len(queue) for p, queue in self._waiters.items()}
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        """Hold one execution slot of a priority class for the block."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self.in_use[priority] -= 1
+            self._dispatch()
+
+    def _can_start(self, priority: Priority) -> bool:
+        if sum(self.in_use.values()) >= self.capacity:
+            return False
+        if priority is Priority.BULK:
+            return self.in_use[priority] < self.capacity - self.reserved
+        return True
+
+    def _has_precedence(self, priority: Priority) -> bool:
+        """Whether requests of this or a more urgent class are waiting."""
+        for other in Priority:
+            if self._waiters[other]:
+                return True
+            if other is priority:
+                return False
+        return False
+
+    async def _acquire(self, priority: Priority) -> None:
+        if not self._has_precedence(priority) and self._can_start(priority):
+            self.in_use[priority] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was already handed over, pass it on
+                self.in_use[priority] -= 1
+                self._dispatch()
+            elif future in self._waiters[priority]:
+                self._waiters[priority].remove(future)
+            raise
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters, most urgent class first."""
+        for priority in Priority:
+            queue = self._waiters[priority]
+            while queue and self._can_start(priority):
+                future = queue.popleft()
+                if not future.done():
+                    self.in_use[priority] += 1
+                    future.set_result(None)
+            if queue:
+                # Less urgent classes wait until this one is served
+                return
+
+
+chain_scheduler = PriorityScheduler(
+    capacity=SCHEDULER_CAPACITY, reserved=SCHEDULER_INTERACTIVE_RESERVED
+)
+
+
+T = TypeVar("T")
+
+
+async def run_to_completion(awaitable: Awaitable[T]) -> T:
+    """
+    Await `awaitable`, letting it finish even if the caller is cancelled
+    meanwhile. The cancellation is re-raised once it has finished.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+
+
+class FlightCancelledError(Exception):
+    """A coalesced call was cancelled on behalf of all its callers."""
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller of a key starts the call, later callers attach to it
+    and get the same result while it is in flight. The call is cancelled
+    once every caller waiting for it has been cancelled, or for all of them
+    through `cancel`.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """Run `fn` once per key, returning its result and whether shared."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _: self._land(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            cancelled_here = asyncio.current_task().cancelling()
+            if flight.task.cancelled() and not cancelled_here:
+                # Cancelled through `cancel`, not by this caller
+                raise FlightCancelledError("The call was cancelled") from None
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def cancel(self, match: Callable[[Hashable], bool]) -> int:
+        """Cancel the calls in flight whose key matches, return their count."""
+        flights = [
+            flight
+            for key, flight in self._flights.items()
+            if match(key) and not flight.task.done()
+        ]
+        for flight in flights:
+            flight.task.cancel()
+        return len(flights)
+
+    def _land(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit tuned by AIMD (additive increase, multiplicative
+    decrease): every success raises the limit by about one per window of
+    requests, every overload signal cuts it by `decrease_factor`. A
+    retry-after hint additionally pauses new requests until it has passed.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        minimum: int = 1,
+        maximum: int,
+        decrease_factor: float = 0.5,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @asynccontextmanager
+    async def acquire(self, urgent: bool = False) -> AsyncIterator[None]:
+        """
+        Hold one request slot for the duration of the block. `urgent`
+        requests are woken before the other waiters.
+        """
+        while self.in_flight >= int(self.limit):
+            future = asyncio.get_running_loop().create_future()
+            if urgent:
+                self._waiters.appendleft(future)
+            else:
+                self._waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Pass a wake-up we may have received on to the next waiter
+                self._wake()
+                raise
+            finally:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+        self.in_flight += 1
+        try:
+            delay = self._paused_until - asyncio.get_running_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self) -> None:
+        """Additive increase."""
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease, honoring the upstream's retry-after."""
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        if retry_after:
+            self._paused_until = max(
+                self._paused_until,
+                asyncio.get_running_loop().time() + retry_after,
+            )
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        for future in list(self._waiters)[: max(0, free)]:
+            if not future.done():
+                future.set_result(None)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is down. Opens after `failure_threshold`
+    consecutive failures and lets a single probe request through once
+    `reset_timeout` seconds have passed; the probe's outcome closes or
+    re-opens the circuit. Every allowed request must end with
+    `on_success`, `on_failure` or `release_probe`.
+    """
+
+    def __init__(self, *, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now."""
+        if self._opened_at is None:
+            return True
+        if self._probing:
+            return False
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        self._probing = True
+        return True
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """
+        End a request that says nothing about the upstream's health, e.g.
+        a rejected input or a cancellation. A probe is let through again.
+        """
+        self._probing = False
+
+
+@dataclass
+class UpstreamGuard:
+    """Adaptive limiter and circuit breaker protecting one upstream."""
+
+    limiter: AdaptiveLimiter
+    breaker: CircuitBreaker
+
+
+_upstream_guards: Dict[Hashable, UpstreamGuard] = {}
+
+
+def get_upstream_guard(key: Hashable) -> UpstreamGuard:
+    """Get the process-wide guard for an upstream, e.g. a chain and model."""
+    guard = _upstream_guards.get(key)
+    if guard is None:
+        guard = _upstream_guards[key] = UpstreamGuard(
+            limiter=AdaptiveLimiter(
+                initial=ADAPTIVE_CONCURRENCY_INITIAL,
+                maximum=ADAPTIVE_CONCURRENCY_MAX,
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT,
+            ),
+        )
+    return guard
@@ -0,0 +1,67 @@
+import os
+
+# LangServe configuration
+LANGSERVE_BASE_URL = os.getenv("LANGSERVE_BASE_URL", "http://localhost:8001")
+LANGSERVE_BATCH_CHUNK_SIZE = int(
+    os.getenv("LANGSERVE_BATCH_CHUNK_SIZE", "25")
+)  # Questions sent per `/batch` request
+LANGSERVE_BATCH_CONCURRENCY = int(
+    os.getenv("LANGSERVE_BATCH_CONCURRENCY", "4")
+)  # `/batch` requests in flight per invocation
+
+CHAIN_EXECUTION_MODE = os.getenv(
+    "CHAIN_EXECUTION_MODE", "langserve"
+)  # "langserve" over HTTP or "in_process" to run the chains in this app
+
+# Retries, adaptive concurrency and circuit breaking per chain and model
+LANGSERVE_MAX_RETRIES = int(os.getenv("LANGSERVE_MAX_RETRIES", "3"))
+LANGSERVE_RETRY_BASE_DELAY = float(
+    os.getenv("LANGSERVE_RETRY_BASE_DELAY", "1")
+)  # Seconds, doubled per attempt with full jitter
+LANGSERVE_RETRY_MAX_DELAY = float(os.getenv("LANGSERVE_RETRY_MAX_DELAY", "30"))
+ADAPTIVE_CONCURRENCY_INITIAL = int(
+    os.getenv("ADAPTIVE_CONCURRENCY_INITIAL", "8")
+)  # `/batch` requests in flight per chain and model before adapting
+ADAPTIVE_CONCURRENCY_MAX = int(os.getenv("ADAPTIVE_CONCURRENCY_MAX", "64"))
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(
+    os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")
+)  # Consecutive connection failures before failing fast
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(
+    os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30")
+)  # Seconds before probing a failed upstream again
+
+# Priority scheduling of chain executions across all invocations
+SCHEDULER_CAPACITY = int(
+    os.getenv("SCHEDULER_CAPACITY", "16")
+)  # Chain requests in flight across all invocations
+SCHEDULER_INTERACTIVE_RESERVED = int(
+    os.getenv("SCHEDULER_INTERACTIVE_RESERVED", "4")
+)  # Slots bulk invocations can't use
+INTERACTIVE_MAX_QUESTIONS = int(
+    os.getenv("INTERACTIVE_MAX_QUESTIONS", "5")
+)  # Invocations up to this size run as interactive by default
+
+# Shared HTTP connection pool for LangServe traffic
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))  # All hosts
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "32"))
+HTTP_KEEPALIVE_TIMEOUT = float(
+    os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60")
+)  # Seconds an idle connection is kept open
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_REQUEST_TIMEOUT = float(
+    os.getenv("HTTP_REQUEST_TIMEOUT", "300")
+)  # Whole request incl. LLM generation for a batch chunk
+
+# Persistent answer cache
+ANSWER_CACHE_MAX_BYTES = int(
+    float(os.getenv("ANSWER_CACHE_MAX_MB", "256")) * 1024 * 1024
+)  # Least recently used answers are evicted beyond this size
+
+# Background job queue configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # Concurrent invocation jobs
+JOB_HISTORY_LIMIT = int(
+    os.getenv("JOB_HISTORY_LIMIT", "200")
+)  # Finished jobs kept in memory for polling
+MATRIX_CONCURRENCY = int(
+    os.getenv("MATRIX_CONCURRENCY", "8")
+)  # `/batch` requests in flight across all cells of a matrix job
@@ -0,0 +1,51 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import aiohttp
+import orjson
+
+from app.core.config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_REQUEST_TIMEOUT,
+)
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize request bodies with orjson."""
+    return orjson.dumps(obj).decode()
+
+
+def json_loads(data: str | bytes) -> Any:
+    """Deserialize response bodies with orjson."""
+    return orjson.loads(data)
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create a pooled client session for LangServe traffic."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_REQUEST_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT
+    )
+    return aiohttp.ClientSession(
+        connector=connector, timeout=timeout, json_serialize=json_dumps
+    )
+
+
+@asynccontextmanager
+async def http_session_scope(
+    http: Optional[aiohttp.ClientSession],
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """Yield the shared client, or a short-lived one if none was injected."""
+    if http is not None and not http.closed:
+        yield http
+        return
+    async with create_http_session() as session:
+        yield session
@@ -0,0 +1,39 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from app.core.logger import get_logger
+from app.models import Base
+
+logger = get_logger(__name__)
+
+
+def add_missing_columns(connection: Connection) -> None:
+    """
+    Add nullable columns that were added to the models after their table
+    was created. `create_all` only creates missing tables, so existing
+    databases would otherwise lack new columns.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {
+            column["name"] for column in inspector.get_columns(table.name)
+        }
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning(
+                    f"Column '{table.name}.{column.name}' is missing and not "
+                    f"nullable, recreate the table to add it"
+                )
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(
+                    f'ALTER TABLE "{table.name}" '
+                    f'ADD COLUMN "{column.name}" {column_type}'
+                )
+            )
+            logger.info(f"Added column '{table.name}.{column.name}'")
@@ -5,6 +5,7 @@ from app.models.question import Question
 from app.models.configuration import Configuration
 from app.models.answer import Answer
 from app.models.answer_comment import AnswerComment
+from app.models.answer_cache import AnswerCacheEntry
 
 __all__ = [
     "Base",
@@ -15,4 +16,5 @@ __all__ = [
     "Configuration",
     "Answer",
     "AnswerComment",
+    "AnswerCacheEntry",
 ]
@@ -1,7 +1,7 @@
 from typing import List, Optional, TYPE_CHECKING
 from uuid import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Text, ForeignKey, Integer, CheckConstraint
+from sqlalchemy import Text, String, ForeignKey, Integer, CheckConstraint
 from app.models.base import BaseModel
 
 if TYPE_CHECKING:
@@ -25,6 +25,13 @@ class Answer(BaseModel):
     generated_answer: Mapped[str] = mapped_column(Text, nullable=False)
     score: Mapped[Optional[int]] = mapped_column(Integer)
 
+    # Performance of the chain run, unset for answers served from cache
+    latency_ms: Mapped[Optional[int]] = mapped_column(Integer)
+    ttft_ms: Mapped[Optional[int]] = mapped_column(Integer)
+    prompt_tokens: Mapped[Optional[int]] = mapped_column(Integer)
+    completion_tokens: Mapped[Optional[int]] = mapped_column(Integer)
+    model_name: Mapped[Optional[str]] = mapped_column(String(100))
+
     # Constraints
     __table_args__ = (
         CheckConstraint("score >= 0 AND score <= 5", name="valid_score_range"),
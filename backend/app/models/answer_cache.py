@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import DateTime, Integer, String, Text
+from app.models.base import BaseModel
+
+
+class AnswerCacheEntry(BaseModel):
+    """SQLAlchemy model for cached answers keyed by chain, config and question"""
+
+    __tablename__ = "answer_cache"
+
+    cache_key: Mapped[str] = mapped_column(
+        String(64),
+        nullable=False,
+        unique=True,
+        index=True,
+        comment="SHA-256 of chain file, canonical config values and question",
+    )
+    chain_file_name: Mapped[str] = mapped_column(String(512), nullable=False)
+    generated_answer: Mapped[str] = mapped_column(Text, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    hit_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_accessed: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.now, nullable=False, index=True
+    )
@@ -28,6 +28,7 @@ from app.schemas.answer_comment import (
     AnswerCommentCreate,
     AnswerCommentUpdate,
 )
+from app.schemas.job import Job, JobProgress, JobStatus
 
 __all__ = [
     # Base schemas
@@ -67,4 +68,8 @@ __all__ = [
     "AnswerCommentBase",
     "AnswerCommentCreate",
     "AnswerCommentUpdate",
+    # Job schemas
+    "Job",
+    "JobProgress",
+    "JobStatus",
 ]
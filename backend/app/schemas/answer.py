@@ -1,16 +1,28 @@
 from typing import Optional, List
 from uuid import UUID
-from pydantic import Field
+from pydantic import ConfigDict, Field
 from app.schemas.base import BaseSchema, TimeStampSchema, IdSchema
 from app.schemas.answer_comment import AnswerComment
 
 
 class AnswerBase(BaseSchema):
+    # Allow the `model_name` field
+    model_config = ConfigDict(protected_namespaces=())
+
     question_id: UUID
     chain_id: UUID
     configuration_id: UUID
     generated_answer: str
     score: Optional[int] = Field(None, ge=0, le=5)
+    latency_ms: Optional[int] = Field(
+        None, description="Wall time of the chain run"
+    )
+    ttft_ms: Optional[int] = Field(
+        None, description="Time to the first generated token"
+    )
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    model_name: Optional[str] = None
 
 
 class AnswerCreate(AnswerBase):
@@ -31,3 +43,24 @@ class AnswerUpdate(BaseSchema):
 
 class AnswerDetail(Answer):
     comments: List[AnswerComment] = []
+
+
+class AnswerMetrics(BaseSchema):
+    """Latency and token usage of the answers of one configuration"""
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    configuration_id: UUID
+    answer_count: int = 0
+    measured_count: int = Field(
+        0, description="Answers with recorded metrics, i.e. not from cache"
+    )
+    avg_latency_ms: Optional[float] = None
+    p50_latency_ms: Optional[float] = None
+    p95_latency_ms: Optional[float] = None
+    avg_ttft_ms: Optional[float] = None
+    total_prompt_tokens: int = 0
+    total_completion_tokens: int = 0
+    avg_prompt_tokens: Optional[float] = None
+    avg_completion_tokens: Optional[float] = None
+    model_names: List[str] = []
@@ -16,6 +16,9 @@ class AvailableChain(BaseSchema):
     """Schema for available chain files in backend/chains directory"""
 
     file_name: str
+    content_hash: str = Field(
+        ..., description="SHA-256 of the chain file, changes with its code"
+    )
 
 
 class ChainSelection(BaseSchema):
@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from pydantic import Field
+from app.schemas.base import BaseSchema, TimeStampSchema, IdSchema
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a background chain invocation job"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobProgress(BaseSchema):
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+class Job(TimeStampSchema, IdSchema):
+    """Schema for polling the state of a chain invocation job"""
+
+    session_id: UUID
+    chain_id: Optional[UUID] = None
+    config_id: Optional[UUID] = None
+    options: Dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus
+    progress: JobProgress
+    errors: List[str] = Field(default_factory=list)
+    answer_ids: List[UUID] = Field(default_factory=list)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cells: List["Job"] = Field(
+        default_factory=list,
+        description="Per (chain, configuration) jobs of a matrix run",
+    )
@@ -3,8 +3,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.models import Base
 from app.db.config import async_engine
+from app.db.migrations import add_missing_columns
 from app.api.v1.endpoints import api_router
+from app.core.concurrency import SingleFlight
+from app.core.http import create_http_session
 from app.core.logger import setup_logging, get_logger
+from app.services.executor import create_chain_executor
+from app.services.job import JobManager
 
 
 logger = get_logger("ragulator_logger")
@@ -23,8 +28,26 @@ async def lifespan(app: FastAPI):
         async with async_engine.begin() as conn:
             logger.info("Creating database tables...")
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(add_missing_columns)
             app.state.db = conn
             logger.info("Database initialization completed")
+
+        # Pooled HTTP client shared by all LangServe calls
+        app.state.http_session = create_http_session()
+
+        # Run chains through LangServe or inside this process
+        app.state.chain_executor = create_chain_executor(
+            app.state.http_session
+        )
+
+        # Coalesce duplicate invocations while they are in flight
+        app.state.invocation_flights = SingleFlight()
+
+        # Start background job workers for chain invocations
+        app.state.job_manager = JobManager(
+            executor=app.state.chain_executor
+        )
+        await app.state.job_manager.start()
         yield
 
     except Exception as e:
@@ -36,6 +59,10 @@ async def lifespan(app: FastAPI):
     finally:
         # Clean up resources on shutdown
         logger.info("Shutting down application...")
+        if hasattr(app.state, "job_manager"):
+            await app.state.job_manager.stop()
+        if hasattr(app.state, "http_session"):
+            await app.state.http_session.close()
         if hasattr(app.state, "db"):
             await app.state.db.close()
         await async_engine.dispose()
@@ -1,6 +1,6 @@
 from typing import List, Type
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,7 +10,7 @@ from app.models.chain import Chain
 from app.models.question import Question
 from app.models.configuration import Configuration
 from app.services.base import BaseService
-from app.schemas.answer import AnswerCreate, AnswerUpdate
+from app.schemas.answer import AnswerCreate, AnswerMetrics, AnswerUpdate
 from app.services.exceptions import (
     AnswerError,
     AnswerNotFoundError,
@@ -207,6 +207,61 @@ class AnswerService(BaseService[Answer]):
             )
             raise AnswerError("Failed to fetch average score") from e
 
+    async def get_metrics_by_configuration(
+        self, configuration_id: UUID
+    ) -> AnswerMetrics:
+        """
+        Aggregate latency and token usage of the answers of a configuration.
+        Answers without recorded metrics (cache hits) only count as answers.
+        """
+        try:
+            await self._validate_references(configuration_id=configuration_id)
+            latency = self.model.latency_ms
+            query = select(
+                func.count(self.model.id),
+                func.count(latency),
+                func.avg(latency),
+                func.percentile_cont(0.5).within_group(latency),
+                func.percentile_cont(0.95).within_group(latency),
+                func.avg(self.model.ttft_ms),
+                func.sum(self.model.prompt_tokens),
+                func.sum(self.model.completion_tokens),
+                func.avg(self.model.prompt_tokens),
+                func.avg(self.model.completion_tokens),
+            ).where(self.model.configuration_id == configuration_id)
+            row = (await self.db.execute(query)).one()
+
+            model_names = await self.db.execute(
+                select(self.model.model_name)
+                .where(
+                    self.model.configuration_id == configuration_id,
+                    self.model.model_name.is_not(None),
+                )
+                .distinct()
+            )
+            metrics = AnswerMetrics(
+                configuration_id=configuration_id,
+                answer_count=row[0],
+                measured_count=row[1],
+                avg_latency_ms=row[2],
+                p50_latency_ms=row[3],
+                p95_latency_ms=row[4],
+                avg_ttft_ms=row[5],
+                total_prompt_tokens=row[6] or 0,
+                total_completion_tokens=row[7] or 0,
+                avg_prompt_tokens=row[8],
+                avg_completion_tokens=row[9],
+                model_names=sorted(model_names.scalars().all()),
+            )
+            logger.info(
+                f"Retrieved metrics of {metrics.measured_count} answers "
+                f"for configuration '{configuration_id}'"
+            )
+            return metrics
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while fetching metrics: {str(e)}")
+            raise AnswerError("Failed to fetch answer metrics") from e
+
     async def update_answer_score(
         self, *, question_id: UUID, answer_id: UUID, data: AnswerUpdate
     ) -> Answer:
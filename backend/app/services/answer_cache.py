@@ -0,0 +1,140 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import ANSWER_CACHE_MAX_BYTES
+from app.core.logger import get_logger
+from app.models.answer_cache import AnswerCacheEntry
+from app.services.base import BaseService
+from app.services.exceptions import AnswerCacheError
+
+logger = get_logger(__name__)
+
+
+class AnswerCacheService(BaseService[AnswerCacheEntry]):
+    def __init__(
+        self,
+        model: Type[AnswerCacheEntry],
+        db: AsyncSession,
+        max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+    ):
+        super().__init__(model, db)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(
+        *,
+        chain_file_name: str,
+        config_values: Optional[Dict[str, Any]],
+        question_text: str,
+        chain_version: Optional[str] = None,
+    ) -> str:
+        """
+        Hash chain, content hash of its code, canonicalized config values and
+        question into a key.
+        """
+        canonical = json.dumps(
+            [
+                chain_file_name,
+                chain_version,
+                config_values or {},
+                question_text,
+            ],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Look up cached answers and mark the hits as recently used."""
+        if not keys:
+            return {}
+        try:
+            result = await self.db.execute(
+                select(
+                    self.model.cache_key, self.model.generated_answer
+                ).where(self.model.cache_key.in_(keys))
+            )
+            hits = dict(result.tuples().all())
+
+            if hits:
+                await self.db.execute(
+                    update(self.model)
+                    .where(self.model.cache_key.in_(hits.keys()))
+                    .values(
+                        hit_count=self.model.hit_count + 1,
+                        last_accessed=datetime.now(),
+                    )
+                )
+                await self.db.commit()
+            return hits
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Failed to read answer cache: {str(e)}")
+            raise AnswerCacheError("Failed to read answer cache") from e
+
+    async def put_many(
+        self, *, chain_file_name: str, answers: Dict[str, str]
+    ) -> None:
+        """Store generated answers by key and evict beyond the size limit."""
+        if not answers:
+            return
+        try:
+            now = datetime.now()
+            statement = insert(self.model).values(
+                [
+                    {
+                        "cache_key": key,
+                        "chain_file_name": chain_file_name,
+                        "generated_answer": answer,
+                        "size_bytes": len(answer.encode()),
+                        "last_accessed": now,
+                    }
+                    for key, answer in answers.items()
+                ]
+            )
+            await self.db.execute(
+                statement.on_conflict_do_nothing(index_elements=["cache_key"])
+            )
+            await self.evict()
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Failed to write answer cache: {str(e)}")
+            raise AnswerCacheError("Failed to write answer cache") from e
+
+    async def evict(self) -> None:
+        """Delete least recently used entries beyond the size limit."""
+        # Ranking all entries by recency is only worth it once over the limit
+        total_size = await self.db.scalar(
+            select(func.coalesce(func.sum(self.model.size_bytes), 0))
+        )
+        if total_size <= self.max_bytes:
+            return
+
+        running_size = (
+            select(
+                self.model.id,
+                func.sum(self.model.size_bytes)
+                .over(order_by=self.model.last_accessed.desc())
+                .label("running_size"),
+            )
+        ).subquery()
+        result = await self.db.execute(
+            delete(self.model).where(
+                self.model.id.in_(
+                    select(running_size.c.id).where(
+                        running_size.c.running_size > self.max_bytes
+                    )
+                )
+            )
+        )
+        if result.rowcount:
+            logger.info(f"Evicted {result.rowcount} answer cache entries")
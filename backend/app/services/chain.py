@@ -1,36 +1,116 @@
-from typing import List, Type
-import os
-import aiohttp
+import asyncio
+import hashlib
+import random
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from itertools import zip_longest
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
 from uuid import UUID
-from pathlib import Path
 from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import (
+    INTERACTIVE_MAX_QUESTIONS,
+    LANGSERVE_BATCH_CHUNK_SIZE,
+    LANGSERVE_BATCH_CONCURRENCY,
+    LANGSERVE_MAX_RETRIES,
+    LANGSERVE_RETRY_BASE_DELAY,
+    LANGSERVE_RETRY_MAX_DELAY,
+)
+from app.core.concurrency import (
+    FairSemaphore,
+    Priority,
+    UpstreamGuard,
+    chain_scheduler,
+    get_upstream_guard,
+    run_to_completion,
+)
 from app.core.logger import get_logger
 from app.models.session import Session
 from app.models.chain import Chain
 from app.models.question import Question
 from app.models.configuration import Configuration
 from app.models.answer import Answer
+from app.models.answer_cache import AnswerCacheEntry
 from app.schemas.answer import AnswerCreate
 from app.services.base import BaseService
 from app.services.question import QuestionService
 from app.services.answer import AnswerService
+from app.services.answer_cache import AnswerCacheService
 from app.services.configuration import ConfigurationService
+from app.services.executor import (
+    ChainExecutor,
+    ChainInputError,
+    LangServeExecutor,
+    RetryableChainError,
+    RunMetrics,
+    elapsed_ms,
+)
+from langserver.registry import get_chain_file, list_chains
 from app.services.exceptions import (
+    AnswerCacheError,
     ChainError,
     ChainNotFoundError,
+    ChainUnavailableError,
     SessionNotFoundError,
 )
 
 logger = get_logger(__name__)
 
 
+@dataclass
+class InvocationProgress:
+    """Mutable progress counters shared with the caller of a chain invocation."""
+
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    parent: Optional["InvocationProgress"] = field(default=None, repr=False)
+
+    def add(self, **counts: int) -> None:
+        """Advance the counters, propagating to the parent progress."""
+        for name, count in counts.items():
+            setattr(self, name, getattr(self, name) + count)
+        if self.parent:
+            self.parent.add(**counts)
+
+
+@dataclass
+class InvocationPlan:
+    """Questions of a chain invocation, grouped by prompt still to generate."""
+
+    chain: Chain
+    config: Configuration
+    questions: List[Question]
+    groups: Dict[str, List[Question]]
+    cached_answers: List[Answer]
+    answer_service: AnswerService
+    cache_service: Optional[AnswerCacheService]
+
+
 class ChainService(BaseService[Chain]):
-    def __init__(self, model: Type[Chain], db: AsyncSession):
+    def __init__(
+        self,
+        model: Type[Chain],
+        db: AsyncSession,
+        executor: Optional[ChainExecutor] = None,
+    ):
         super().__init__(model, db)
         self.session_model = Session
+        self.executor = executor or LangServeExecutor()
 
     async def _validate_session(self, session_id: UUID) -> bool:
         """Check if session exists using Session model."""
@@ -98,32 +178,17 @@ class ChainService(BaseService[Chain]):
         """Normalize chain name by removing .py extension if present."""
         return chain_name[:-3] if chain_name.endswith(".py") else chain_name
 
-    async def get_available_chains(self) -> List[str]:
-        """Get all available chain files from backend/chains directory."""
+    async def get_available_chains(self) -> Dict[str, str]:
+        """
+        Content hashes of all available chain files in the backend/chains
+        directory, by file name.
+        """
         try:
-            # Get project root directory by going up from current service file
-            service_dir = Path(__file__).resolve().parent
-            backend_dir = service_dir.parent.parent
-            chains_dir = backend_dir / "langserver" / "chains"
-
-            logger.info(f"Scanning chains directory: {chains_dir}")
-
-            # Validate directory exists
-            if not chains_dir.exists():
-                logger.error(f"Chains directory not found: {chains_dir}")
-                raise ChainError(f"Chains directory not found: {chains_dir}")
-
-            # Get all .py files
-            chain_files = []
-            for f in chains_dir.glob("*.py"):
-                if f.is_file():
-                    # Only return filename relative to chains dir
-                    chain_files.append(f.name)
-                    logger.info(f"Found chain file: {f.name}")
-
-            logger.info(f"Found {len(chain_files)} chain files")
-            return chain_files
-        except Exception as e:
+            return {
+                chain_file.file_name: chain_file.content_hash
+                for chain_file in list_chains()
+            }
+        except OSError as e:
             logger.error(f"Error scanning chains directory: {str(e)}")
             raise ChainError("Failed to scan chains directory") from e
 
@@ -197,6 +262,25 @@ class ChainService(BaseService[Chain]):
             session_id=session_id, chain_id=chain_id
         )
 
+    async def get_evaluation_matrix(
+        self, session_id: UUID
+    ) -> List[Tuple[Chain, Configuration]]:
+        """
+        Get all (chain, configuration) pairs of a session, interleaved across
+        chains so that scheduling them in order spreads work over all chains.
+        """
+        chains = await self.get_session_chains(session_id)
+        per_chain = [
+            [(chain, config) for config in chain.configurations]
+            for chain in chains
+        ]
+        return [
+            cell
+            for row in zip_longest(*per_chain)
+            for cell in row
+            if cell is not None
+        ]
+
     async def delete_session_chain(
         self, *, session_id: UUID, chain_id: UUID
     ) -> Chain:
@@ -225,93 +309,665 @@ class ChainService(BaseService[Chain]):
             )
             raise ChainError("Failed to delete session chains") from e
 
-    async def invoke_chain_batch(
-        self, *, session_id: UUID, chain_id: UUID, config_id: UUID
-    ) -> List[Answer]:
-        """Invoke chain in batch for all questions in session and save answers."""
+    async def _invoke_batch(
+        self,
+        *,
+        chain_name: str,
+        inputs: List[str],
+        config_values: Optional[Dict[str, Any]],
+        session_id: Optional[UUID] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.BULK,
+    ) -> List[Tuple[str, RunMetrics]]:
+        """
+        Run a chain for a list of inputs with the chain executor, returning
+        the output and metrics of every run.
+
+        Requests wait for a slot of their priority class in the chain
+        scheduler, then go through the adaptive limiter and circuit breaker
+        of the chain and its generation model. Transient failures are
+        retried with jittered exponential backoff, waiting at least as long
+        as the upstream's retry-after hint.
+        """
+        urgent = priority is Priority.INTERACTIVE
+        for attempt in range(LANGSERVE_MAX_RETRIES + 1):
+            guard = self._get_guard(chain_name, config_values)
+            try:
+                slot = chain_scheduler.slot(priority)
+                async with slot, guard.limiter.acquire(urgent):
+                    results = await self.executor.batch(
+                        chain_name=chain_name,
+                        inputs=inputs,
+                        config_values=config_values,
+                        metadata=self._run_metadata(session_id, use_cache),
+                    )
+            except RetryableChainError as e:
+                self._report_failure(guard, e)
+                if attempt == LANGSERVE_MAX_RETRIES:
+                    raise
+                delay = random.uniform(
+                    0,
+                    min(
+                        LANGSERVE_RETRY_MAX_DELAY,
+                        LANGSERVE_RETRY_BASE_DELAY * 2**attempt,
+                    ),
+                )
+                delay = max(delay, e.retry_after or 0)
+                logger.warning(
+                    f"Retrying chain '{chain_name}' in {delay:.2f}s "
+                    f"(attempt {attempt + 1}/{LANGSERVE_MAX_RETRIES}): "
+                    f"{str(e)}"
+                )
+                await asyncio.sleep(delay)
+            except BaseException:
+                guard.breaker.release_probe()
+                raise
+            else:
+                guard.limiter.on_success()
+                guard.breaker.on_success()
+                return results
+
+    def _get_guard(
+        self, chain_name: str, config_values: Optional[Dict[str, Any]]
+    ) -> UpstreamGuard:
+        """Get the guard of a chain and its generation model."""
+        model_name = (config_values or {}).get("generation_model")
+        guard = get_upstream_guard((chain_name, model_name))
+        if not guard.breaker.allow_request():
+            raise ChainUnavailableError(
+                f"Chain '{chain_name}' is unavailable, "
+                f"not sending requests until it recovers"
+            )
+        return guard
+
+    def _report_failure(
+        self, guard: UpstreamGuard, error: RetryableChainError
+    ) -> None:
+        """Let the guard adapt to a transient failure."""
+        if error.overloaded:
+            guard.limiter.on_overload(error.retry_after)
+        if error.upstream_down:
+            guard.breaker.on_failure()
+        else:
+            guard.breaker.release_probe()
+
+    async def _stream_answer(
+        self,
+        *,
+        chain_name: str,
+        question_text: str,
+        config_values: Optional[Dict[str, Any]],
+        on_token: Callable[[str], None],
+        session_id: Optional[UUID] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.BULK,
+    ) -> Tuple[str, RunMetrics]:
+        """
+        Stream one answer, reporting its tokens, and return the output with
+        the metrics of the run.
+        """
+        guard = self._get_guard(chain_name, config_values)
+        urgent = priority is Priority.INTERACTIVE
+        root_run_id = None
+        output = None
+        metrics = RunMetrics()
         try:
-            # Validate chain exists
-            chain = await self._validate_session_chain(
-                session_id=session_id, chain_id=chain_id
+            slot = chain_scheduler.slot(priority)
+            async with slot, guard.limiter.acquire(urgent):
+                started_at = time.perf_counter()
+                async for event in self.executor.stream_events(
+                    chain_name=chain_name,
+                    input=question_text,
+                    config_values=config_values,
+                    metadata=self._run_metadata(session_id, use_cache),
+                ):
+                    # The first event is the start of the chain run itself
+                    root_run_id = root_run_id or event.get("run_id")
+                    kind = event.get("event")
+                    data = event.get("data") or {}
+                    if kind == "on_chat_model_stream":
+                        content = self._message_field(
+                            data.get("chunk"), "content"
+                        )
+                        if content:
+                            if metrics.ttft_ms is None:
+                                metrics.ttft_ms = elapsed_ms(started_at)
+                            on_token(content)
+                    elif kind == "on_chat_model_end":
+                        message = data.get("output")
+                        metrics.add_usage(
+                            self._message_field(message, "usage_metadata")
+                        )
+                        response_metadata = (
+                            self._message_field(message, "response_metadata")
+                            or {}
+                        )
+                        metrics.model_name = (
+                            response_metadata.get("model_name")
+                            or (event.get("metadata") or {}).get(
+                                "ls_model_name"
+                            )
+                            or metrics.model_name
+                        )
+                    elif (
+                        kind == "on_chain_end"
+                        and event.get("run_id") == root_run_id
+                    ):
+                        output = data.get("output")
+                        metrics.latency_ms = elapsed_ms(started_at)
+        except RetryableChainError as e:
+            self._report_failure(guard, e)
+            raise
+        except BaseException:
+            guard.breaker.release_probe()
+            raise
+        guard.limiter.on_success()
+        guard.breaker.on_success()
+
+        if output is None:
+            raise ChainError("Invalid response format from chain")
+        return output, metrics
+
+    @staticmethod
+    def _run_metadata(
+        session_id: Optional[UUID], use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Metadata of chain runs, e.g. for the chains' LLM cache stats. Runs
+        without `use_cache` don't reuse memoized chain stages either.
+        """
+        metadata: Dict[str, Any] = {}
+        if session_id:
+            metadata["session_id"] = str(session_id)
+        if not use_cache:
+            # `BYPASS_METADATA_KEY` of langserver/memo.py
+            metadata["bypass_stage_cache"] = True
+        return metadata
+
+    @staticmethod
+    def _message_field(message: Any, name: str) -> Any:
+        """Get a field of a message (chunk), serialized or not."""
+        if isinstance(message, dict):
+            return message.get(name)
+        return getattr(message, name, None)
+
+    async def _read_answer_cache(
+        self, cache_service: AnswerCacheService, keys: List[str]
+    ) -> Dict[str, str]:
+        """Read cached answers, treating cache failures as misses."""
+        try:
+            return await cache_service.get_many(keys)
+        except AnswerCacheError as e:
+            logger.warning(f"Answer cache unavailable: {str(e)}")
+            return {}
+
+    async def _write_answer_cache(
+        self,
+        cache_service: AnswerCacheService,
+        *,
+        chain_file_name: str,
+        answers: Dict[str, str],
+    ) -> None:
+        """Cache generated answers without failing the invocation."""
+        try:
+            await cache_service.put_many(
+                chain_file_name=chain_file_name, answers=answers
             )
+        except AnswerCacheError as e:
+            logger.warning(f"Answer cache unavailable: {str(e)}")
+
+    async def validate_invocation(
+        self, *, session_id: UUID, chain_id: UUID, config_id: UUID
+    ) -> Tuple[Chain, Configuration]:
+        """Validate that chain and configuration belong to the session."""
+        chain = await self._validate_session_chain(
+            session_id=session_id, chain_id=chain_id
+        )
+        configuration_service = ConfigurationService(Configuration, self.db)
+        config = await configuration_service.get_configuration_by_id(
+            session_id=session_id, config_id=config_id
+        )
+        return chain, config
+
+    async def get_question_set_hash(
+        self, session_id: UUID, question_ids: Optional[List[UUID]] = None
+    ) -> str:
+        """Fingerprint the (selected) session questions, ignoring order."""
+        question_service = QuestionService(Question, self.db)
+        questions = await question_service.get_session_questions(
+            session_id, question_ids
+        )
+        digest = hashlib.sha256()
+        for question in sorted(questions, key=lambda q: str(q.id)):
+            digest.update(f"{question.id}:{question.question_text}\n".encode())
+        return digest.hexdigest()
+
+    async def _plan_invocation(
+        self,
+        *,
+        session_id: UUID,
+        chain_id: UUID,
+        config_id: UUID,
+        question_ids: Optional[List[UUID]],
+        missing_only: bool,
+        use_cache: bool,
+        progress: InvocationProgress,
+    ) -> InvocationPlan:
+        """
+        Collect the questions to answer and save cached answers right away.
+
+        Questions are grouped by prompt, so duplicates are generated once.
+        """
+        # Validate chain and configuration exist
+        chain, config = await self.validate_invocation(
+            session_id=session_id, chain_id=chain_id, config_id=config_id
+        )
 
-            # Get all questions for the session
-            question_service = QuestionService(Question, self.db)
+        # Get all (selected) questions for the session
+        question_service = QuestionService(Question, self.db)
+        if missing_only:
+            # Only generate questions still missing for this pair
+            questions = await question_service.get_unanswered_questions(
+                session_id,
+                chain_id=chain_id,
+                configuration_id=config_id,
+                question_ids=question_ids,
+            )
+        else:
             questions = await question_service.get_session_questions(
-                session_id
+                session_id, question_ids
             )
+        answer_service = AnswerService(Answer, self.db)
 
-            if not questions:
-                logger.warning(
-                    f"No questions found for session '{session_id}'"
-                )
-                return []
-
-            # Get configuration
-            configuration_service = ConfigurationService(
-                Configuration, self.db
+        cache_service = (
+            AnswerCacheService(AnswerCacheEntry, self.db)
+            if use_cache
+            else None
+        )
+        plan = InvocationPlan(
+            chain=chain,
+            config=config,
+            questions=questions,
+            groups={},
+            cached_answers=[],
+            answer_service=answer_service,
+            cache_service=cache_service,
+        )
+        if not questions:
+            logger.warning(
+                f"No questions to answer for session '{session_id}'"
             )
-            config = await configuration_service.get_configuration_by_id(
-                session_id=session_id, config_id=config_id
+            return plan
+
+        progress.add(total=len(questions))
+        # Answers of an older version of the chain's code aren't reused
+        chain_file = get_chain_file(chain.file_name)
+        chain_version = chain_file.content_hash if chain_file else None
+        for question in questions:
+            key = (
+                cache_service.make_key(
+                    chain_file_name=chain.file_name,
+                    chain_version=chain_version,
+                    config_values=config.config_values,
+                    question_text=question.question_text,
+                )
+                if cache_service
+                else str(question.id)
             )
+            plan.groups.setdefault(key, []).append(question)
 
-            # Call LangServe batch endpoint
-            question_texts = [q.question_text for q in questions]
-            async with aiohttp.ClientSession() as session:
-                url = f"{os.getenv('LANGSERVE_BASE_URL', 'http://localhost:8001')}/{chain.file_name}/batch"
-
-                payload = {
-                    "inputs": question_texts,
-                    "config": {"configurable": config.config_values},
-                    "kwargs": {},
-                }
-
-                async with session.post(url, json=payload) as response:
-                    if response.status != 200:
-                        raise ChainError(
-                            f"Chain invocation failed: {await response.text()}"
-                        )
-
-                    response_data = await response.json()
-                    # Extract answers from output array
-                    generated_answers = response_data["output"]
-
-                    if not isinstance(generated_answers, list):
-                        raise ChainError(
-                            "Invalid response format from LangServe"
-                        )
-
-                    # Create AnswerCreate objects mapping questions to their answers
-                    answers_data = [
+        if cache_service:
+            hits = await self._read_answer_cache(
+                cache_service, list(plan.groups)
+            )
+            if hits:
+                plan.cached_answers = await answer_service.create_bulk(
+                    objects_data=[
                         AnswerCreate(
                             question_id=question.id,
                             chain_id=chain_id,
                             configuration_id=config_id,
                             generated_answer=answer,
-                        )
-                        for question, answer in zip(
-                            questions, generated_answers
-                        )
+                        ).model_dump()
+                        for key, answer in hits.items()
+                        for question in plan.groups.pop(key)
                     ]
+                )
+                progress.add(completed=len(plan.cached_answers))
+            progress.add(
+                cache_hits=len(questions) - len(plan.groups),
+                cache_misses=len(plan.groups),
+            )
+        return plan
+
+    def _default_priority(self, plan: InvocationPlan) -> Priority:
+        """Schedule small invocations as interactive, large ones as bulk."""
+        if len(plan.groups) <= INTERACTIVE_MAX_QUESTIONS:
+            return Priority.INTERACTIVE
+        return Priority.BULK
+
+    async def _save_outputs(
+        self,
+        plan: InvocationPlan,
+        items: List[Tuple[str, List[Question]]],
+        results: List[Tuple[str, RunMetrics]],
+    ) -> List[Answer]:
+        """
+        Save generated answers with the metrics of their runs for groups of
+        questions and cache them.
+        """
+        created = await plan.answer_service.create_bulk(
+            objects_data=[
+                AnswerCreate(
+                    question_id=question.id,
+                    chain_id=plan.chain.id,
+                    configuration_id=plan.config.id,
+                    generated_answer=answer,
+                    **asdict(metrics),
+                ).model_dump()
+                for (_, group), (answer, metrics) in zip(items, results)
+                for question in group
+            ]
+        )
+        if plan.cache_service:
+            await self._write_answer_cache(
+                plan.cache_service,
+                chain_file_name=plan.chain.file_name,
+                answers={
+                    key: answer
+                    for (key, _), (answer, _) in zip(items, results)
+                },
+            )
+        return created
 
-                    logger.critical(
-                        f"Answers data: {answers_data}"
-                    )  # TODO: Remove this line
+    async def invoke_chain_batch(
+        self,
+        *,
+        session_id: UUID,
+        chain_id: UUID,
+        config_id: UUID,
+        chunk_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        question_ids: Optional[List[UUID]] = None,
+        missing_only: bool = False,
+        use_cache: bool = True,
+        priority: Optional[Priority] = None,
+        progress: Optional[InvocationProgress] = None,
+        limiter: Optional[FairSemaphore] = None,
+    ) -> List[Answer]:
+        """
+        Invoke chain in batch for all questions in session and save answers.
+
+        Answers are committed chunk by chunk, so a failing chunk only loses
+        its own questions. `question_ids` restricts the invocation to a
+        subset of the questions, and with `missing_only`, questions that
+        already have an answer for this chain and configuration are
+        skipped. Unless
+        `use_cache` is disabled, duplicate questions are generated once and
+        answers cached for the same chain and config values are reused
+        instead of calling LangServe. A `limiter`
+        shared between invocations caps their LangServe requests in flight
+        as a whole and spreads them fairly across chains.
+
+        Cancelling the invocation aborts its outstanding requests and skips
+        chunks not yet sent, while answers already generated are saved.
+
+        Without a `priority`, invocations generating up to
+        `INTERACTIVE_MAX_QUESTIONS` answers are scheduled as interactive,
+        larger ones as bulk.
+        """
+        progress = progress or InvocationProgress()
+        try:
+            plan = await self._plan_invocation(
+                session_id=session_id,
+                chain_id=chain_id,
+                config_id=config_id,
+                question_ids=question_ids,
+                missing_only=missing_only,
+                use_cache=use_cache,
+                progress=progress,
+            )
+            if not plan.questions:
+                return []
+            chain, config, questions = plan.chain, plan.config, plan.questions
+            priority = priority or self._default_priority(plan)
+            chunk_size = chunk_size or LANGSERVE_BATCH_CHUNK_SIZE
+            max_concurrency = max_concurrency or LANGSERVE_BATCH_CONCURRENCY
+            answers = list(plan.cached_answers)
+
+            # Split prompts into chunks, keeping a bounded number in flight
+            pending = list(plan.groups.items())
+            chunks = [
+                pending[i : i + chunk_size]
+                for i in range(0, len(pending), chunk_size)
+            ]
+            semaphore = asyncio.Semaphore(max_concurrency)
+            # The database session must not be used by two chunks at once
+            db_lock = asyncio.Lock()
+
+            async def run_chunk(
+                chunk: List[Tuple[str, List[Question]]],
+            ) -> List[Answer]:
+                slot = limiter.acquire(chain_id) if limiter else nullcontext()
+                async with semaphore, slot:
+                    results = await self._invoke_batch(
+                        chain_name=chain.file_name,
+                        inputs=[group[0].question_text for _, group in chunk],
+                        config_values=config.config_values,
+                        session_id=session_id,
+                        use_cache=plan.cache_service is not None,
+                        priority=priority,
+                    )
 
-                    # Use Answer service to create answers in bulk
-                    answer_service = AnswerService(Answer, self.db)
-                    answers = await answer_service.create_bulk(
-                        objects_data=[
-                            answer.model_dump() for answer in answers_data
-                        ]
+                async def save() -> List[Answer]:
+                    async with db_lock:
+                        created = await self._save_outputs(
+                            plan, chunk, results
+                        )
+                    progress.add(completed=len(created))
+                    return created
+
+                # Commit the chunk right away so a later failure keeps it,
+                # generated answers are paid for even when cancelled
+                return await run_to_completion(save())
+
+            async def run_chunk_safely(
+                chunk: List[Tuple[str, List[Question]]],
+            ) -> List[Answer | Exception]:
+                try:
+                    return await run_chunk(chunk)
+                except ChainInputError as e:
+                    if len(chunk) == 1:
+                        error = e
+                    else:
+                        # One bad input fails the whole batch, so retry
+                        # the halves to save the items that do work
+                        middle = len(chunk) // 2
+                        logger.warning(
+                            f"Chunk of {len(chunk)} failed, retrying "
+                            f"halves: {str(e)}"
+                        )
+                        left, right = await asyncio.gather(
+                            run_chunk_safely(chunk[:middle]),
+                            run_chunk_safely(chunk[middle:]),
+                        )
+                        return left + right
+                except (ChainError, SQLAlchemyError) as e:
+                    error = e
+                progress.add(failed=sum(len(group) for _, group in chunk))
+                logger.error(f"Chunk invocation failed: {str(error)}")
+                return [error]
+
+            tasks = [
+                asyncio.create_task(run_chunk_safely(chunk))
+                for chunk in chunks
+            ]
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException as e:
+                # Don't leave sibling chunks running after a failure
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                if isinstance(e, asyncio.CancelledError):
+                    logger.warning(
+                        f"Cancelled invocation of chain '{chain_id}' and "
+                        f"configuration '{config_id}', {progress.completed} "
+                        f"of {progress.total} answers were saved"
                     )
+                raise
+
+            outcomes = [outcome for result in results for outcome in result]
+            answers.extend(o for o in outcomes if not isinstance(o, Exception))
+            failures = [o for o in outcomes if isinstance(o, Exception)]
 
-                    logger.info(
-                        f"Created {len(answers)} answers for {len(questions)} questions "
-                        f"using chain '{chain_id}' and configuration '{config_id}'"
+            # Return answers in question order
+            question_order = {q.id: i for i, q in enumerate(questions)}
+            answers.sort(key=lambda answer: question_order[answer.question_id])
+
+            logger.info(
+                f"Created {len(answers)} answers for {len(questions)} questions "
+                f"using chain '{chain_id}' and configuration '{config_id}' "
+                f"in {len(chunks)} chunks of up to {chunk_size} "
+                f"(cache hits: {progress.cache_hits}, "
+                f"misses: {progress.cache_misses})"
+            )
+            if failures:
+                error_type = (
+                    ChainUnavailableError
+                    if all(
+                        isinstance(f, ChainUnavailableError) for f in failures
                     )
-                    return answers
+                    else ChainError
+                )
+                raise error_type(
+                    f"{len(failures)} requests for "
+                    f"{len(questions) - len(answers)} questions failed, "
+                    f"{len(answers)} answers were saved, rerun with missing_only to complete: "
+                    f"{str(failures[0])}"
+                )
+            return answers
+
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while invoking chain: {str(e)}")
+            raise ChainError("Failed to invoke chain") from e
 
+    async def stream_chain_batch(
+        self,
+        *,
+        session_id: UUID,
+        chain_id: UUID,
+        config_id: UUID,
+        max_concurrency: Optional[int] = None,
+        question_ids: Optional[List[UUID]] = None,
+        missing_only: bool = False,
+        use_cache: bool = True,
+        priority: Optional[Priority] = None,
+        progress: Optional[InvocationProgress] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Invoke chain for all (selected) questions in session, streaming the
+        results. Takes the same options as `invoke_chain_batch`.
+
+        Every question is streamed from LangServe on its own and its answer
+        saved as soon as it completes. Yields `("token", ...)` for generated
+        tokens, `("answer", Answer)` for saved answers (cache hits first),
+        `("error", ...)` for questions that failed and finally
+        `("done", InvocationProgress)`.
+        """
+        progress = progress or InvocationProgress()
+        try:
+            plan = await self._plan_invocation(
+                session_id=session_id,
+                chain_id=chain_id,
+                config_id=config_id,
+                question_ids=question_ids,
+                missing_only=missing_only,
+                use_cache=use_cache,
+                progress=progress,
+            )
         except SQLAlchemyError as e:
             logger.error(f"Database error while invoking chain: {str(e)}")
             raise ChainError("Failed to invoke chain") from e
+
+        for answer in plan.cached_answers:
+            yield "answer", answer
+
+        priority = priority or self._default_priority(plan)
+
+        events: asyncio.Queue[Optional[Tuple[str, Any]]] = asyncio.Queue()
+        semaphore = asyncio.Semaphore(
+            max_concurrency or LANGSERVE_BATCH_CONCURRENCY
+        )
+        # The database session must not be used by two questions at once
+        db_lock = asyncio.Lock()
+
+        async def run_group(key: str, group: List[Question]) -> None:
+            question_ids = [str(question.id) for question in group]
+            try:
+                async with semaphore:
+                    result = await self._stream_answer(
+                        chain_name=plan.chain.file_name,
+                        question_text=group[0].question_text,
+                        config_values=plan.config.config_values,
+                        session_id=plan.chain.session_id,
+                        use_cache=plan.cache_service is not None,
+                        priority=priority,
+                        on_token=lambda content: events.put_nowait(
+                            (
+                                "token",
+                                {
+                                    "question_ids": question_ids,
+                                    "content": content,
+                                },
+                            )
+                        ),
+                    )
+
+                async def save() -> List[Answer]:
+                    async with db_lock:
+                        return await self._save_outputs(
+                            plan, [(key, group)], [result]
+                        )
+
+                created = await run_to_completion(save())
+                progress.add(completed=len(created))
+                for answer in created:
+                    events.put_nowait(("answer", answer))
+            except (ChainError, SQLAlchemyError) as e:
+                progress.add(failed=len(group))
+                logger.error(f"Streaming answer failed: {str(e)}")
+                events.put_nowait(
+                    (
+                        "error",
+                        {"question_ids": question_ids, "detail": str(e)},
+                    )
+                )
+
+        async def run_all() -> None:
+            try:
+                await asyncio.gather(
+                    *(
+                        run_group(key, group)
+                        for key, group in plan.groups.items()
+                    )
+                )
+            finally:
+                events.put_nowait(None)
+
+        runner = asyncio.create_task(run_all())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            await runner
+        finally:
+            # The consumer may stop early, e.g. when the client is gone
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+
+        logger.info(
+            f"Streamed {progress.completed} answers for "
+            f"{len(plan.questions)} questions using chain '{chain_id}' and "
+            f"configuration '{config_id}' ({progress.failed} failed)"
+        )
+        yield "done", progress
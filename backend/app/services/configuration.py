@@ -1,11 +1,12 @@
-from typing import List, Type, Dict, Any
+from typing import List, Optional, Type, Dict, Any
 from uuid import UUID
 from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 import aiohttp
-import os
 
+from app.core.config import LANGSERVE_BASE_URL
+from app.core.http import http_session_scope, json_loads
 from app.core.logger import get_logger
 from app.models.session import Session
 from app.models.chain import Chain
@@ -27,13 +28,17 @@ logger = get_logger(__name__)
 
 
 class ConfigurationService(BaseService[Configuration]):
-    def __init__(self, model: Type[Configuration], db: AsyncSession):
+    def __init__(
+        self,
+        model: Type[Configuration],
+        db: AsyncSession,
+        http: Optional[aiohttp.ClientSession] = None,
+    ):
         super().__init__(model, db)
         self.session_model = Session
         self.chain_model = Chain
-        self.langserve_base_url = os.getenv(
-            "LANGSERVE_BASE_URL", "http://localhost:8001"
-        )
+        self.http = http
+        self.langserve_base_url = LANGSERVE_BASE_URL
 
     async def _validate_session(self, session_id: UUID) -> bool:
         """Validate if the queried session exists."""
@@ -105,7 +110,8 @@ class ConfigurationService(BaseService[Configuration]):
         self, chain_file_name: str
     ) -> Dict[str, Any]:
         """
-        Fetch configuration schema from LangServe endpoint using aiohttp.
+        Fetch configuration schema from LangServe endpoint using the shared
+        aiohttp client.
 
         Args:
             chain_file_name: Name of the chain file
@@ -116,7 +122,7 @@ class ConfigurationService(BaseService[Configuration]):
         Raises:
             ConfigurationError: If fetching schema fails
         """
-        async with aiohttp.ClientSession() as session:
+        async with http_session_scope(self.http) as session:
             try:
                 url = f"{self.langserve_base_url}/{chain_file_name}/config_schema"
                 async with session.get(url) as response:
@@ -125,7 +131,7 @@ class ConfigurationService(BaseService[Configuration]):
                         raise ConfigurationError(
                             f"Failed to fetch config schema for the url {url}: {error_text}"
                         )
-                    return await response.json()
+                    return await response.json(loads=json_loads)
 
             except aiohttp.ClientError as e:
                 logger.error(
@@ -24,6 +24,12 @@ class ChainNotFoundError(ChainError):
     pass
 
 
+class ChainUnavailableError(ChainError):
+    """Raised when the LangServe upstream of a chain is failing"""
+
+    pass
+
+
 # ConfigurationsAPI
 class ConfigurationError(Exception):
     """Base exception for configuration service errors"""
@@ -91,3 +97,23 @@ class QuestionNotFoundError(AnswerError):
     """Raised when question is not found"""
 
     pass
+
+
+# Answer cache
+class AnswerCacheError(Exception):
+    """Base exception for answer cache errors"""
+
+    pass
+
+
+# JobsAPI
+class JobError(Exception):
+    """Base exception for job service errors"""
+
+    pass
+
+
+class JobNotFoundError(JobError):
+    """Raised when job is not found"""
+
+    pass
@@ -0,0 +1,382 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from app.core.config import CHAIN_EXECUTION_MODE, LANGSERVE_BASE_URL
+from app.core.http import http_session_scope, json_loads
+from app.core.logger import get_logger
+from app.services.exceptions import ChainError
+
+logger = get_logger(__name__)
+
+# Provider rate limits surface as LangServe errors mentioning one of these
+RATE_LIMIT_MARKERS = ("ratelimiterror", "rate limit", "429")
+# Provider rejections of a prompt, e.g. one exceeding the context window
+INPUT_REJECTED_MARKERS = ("badrequesterror", "context_length_exceeded")
+# Status codes of requests rejected for their payload
+INPUT_REJECTED_STATUSES = (400, 413, 422)
+
+
+class ChainEndpointNotFoundError(ChainError):
+    """The chain executor has no chain of the requested name."""
+
+
+class ChainInputError(ChainError):
+    """
+    A chain rejected its inputs. Rerunning the inputs separately may
+    succeed for all but the offending ones.
+    """
+
+
+class RetryableChainError(ChainError):
+    """Transient chain failure worth retrying after a backoff."""
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        overloaded: bool = False,
+        upstream_down: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.overloaded = overloaded
+        self.upstream_down = upstream_down
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+
+@dataclass
+class RunMetrics:
+    """Latency and token usage of the chain run behind one answer."""
+
+    latency_ms: Optional[int] = None
+    ttft_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    model_name: Optional[str] = None
+
+    def add_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        """Add the token usage of one model call of the run."""
+        if not usage:
+            return
+        # `usage_metadata` of messages or `token_usage` of OpenAI responses
+        prompt = usage.get("input_tokens", usage.get("prompt_tokens"))
+        completion = usage.get("output_tokens", usage.get("completion_tokens"))
+        if prompt is not None:
+            self.prompt_tokens = (self.prompt_tokens or 0) + prompt
+        if completion is not None:
+            self.completion_tokens = (self.completion_tokens or 0) + completion
+
+
+def elapsed_ms(started_at: float) -> int:
+    """Milliseconds since a `time.perf_counter()` reading."""
+    return round((time.perf_counter() - started_at) * 1000)
+
+
+class ChainExecutor(ABC):
+    """Runs the chains of `langserver/chains` for the main app."""
+
+    @abstractmethod
+    async def batch(
+        self,
+        *,
+        chain_name: str,
+        inputs: List[str],
+        config_values: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Any, RunMetrics]]:
+        """
+        Run a chain for a list of inputs, returning one output each.
+        `metadata` is added to the metadata of every run.
+        """
+
+    @abstractmethod
+    def stream_events(
+        self,
+        *,
+        chain_name: str,
+        input: str,
+        config_values: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the `astream_events` (v2) of one chain run."""
+
+
+class LangServeExecutor(ChainExecutor):
+    """Calls the chains through the HTTP endpoints of the LangServe app."""
+
+    def __init__(
+        self,
+        http: Optional[aiohttp.ClientSession] = None,
+        base_url: str = LANGSERVE_BASE_URL,
+    ):
+        self.http = http
+        self.base_url = base_url
+
+    async def batch(
+        self,
+        *,
+        chain_name: str,
+        inputs: List[str],
+        config_values: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Any, RunMetrics]]:
+        """
+        Send a single request to the measured batch endpoint of the
+        LangServe app, which returns the metrics of every run with its
+        output.
+        """
+        url = f"{self.base_url}/{chain_name}/measured_batch"
+        payload = {
+            "inputs": inputs,
+            "config": {
+                "configurable": config_values,
+                "metadata": metadata or {},
+            },
+            "kwargs": {},
+        }
+
+        try:
+            async with http_session_scope(self.http) as session:
+                async with session.post(url, json=payload) as response:
+                    if response.status != 200:
+                        raise self._classify_failure(
+                            response.status,
+                            await response.text(),
+                            response.headers.get("Retry-After"),
+                        )
+                    response_data = await response.json(loads=json_loads)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Network error while invoking chain: {str(e)}")
+            raise RetryableChainError(
+                f"Failed to connect to LangServe endpoint: {str(e)}",
+                upstream_down=True,
+            ) from e
+
+        # Extract answers and their run metrics from the output arrays
+        outputs = response_data.get("output")
+        metrics = response_data.get("metrics")
+        if (
+            not isinstance(outputs, list)
+            or not isinstance(metrics, list)
+            or len(outputs) != len(inputs)
+            or len(metrics) != len(inputs)
+        ):
+            raise ChainError("Invalid response format from LangServe")
+        return [
+            (output, RunMetrics(**run_metrics))
+            for output, run_metrics in zip(outputs, metrics)
+        ]
+
+    async def stream_events(
+        self,
+        *,
+        chain_name: str,
+        input: str,
+        config_values: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Read the server-sent events of the LangServe stream endpoint."""
+        url = f"{self.base_url}/{chain_name}/stream_events"
+        payload = {
+            "input": input,
+            "config": {
+                "configurable": config_values,
+                "metadata": metadata or {},
+            },
+            "kwargs": {},
+        }
+
+        try:
+            async with http_session_scope(self.http) as session:
+                async with session.post(url, json=payload) as response:
+                    if response.status != 200:
+                        raise self._classify_failure(
+                            response.status,
+                            await response.text(),
+                            response.headers.get("Retry-After"),
+                        )
+
+                    # Server-sent events: `event:` and `data:` lines
+                    event_name = None
+                    async for raw_line in response.content:
+                        line = raw_line.decode().rstrip("\r\n")
+                        if line.startswith("event:"):
+                            event_name = line[6:].strip()
+                            if event_name == "end":
+                                break
+                        elif line.startswith("data:"):
+                            data = line[5:].strip()
+                            if event_name == "error":
+                                raise ChainError(
+                                    f"Chain invocation failed: {data}"
+                                )
+                            if event_name == "data":
+                                yield json_loads(data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Network error while streaming chain: {str(e)}")
+            raise RetryableChainError(
+                f"Failed to connect to LangServe endpoint: {str(e)}",
+                upstream_down=True,
+            ) from e
+
+    def _classify_failure(
+        self, status: int, detail: str, retry_after: Optional[str]
+    ) -> ChainError:
+        """Map a failed LangServe response to a (retryable) chain error."""
+        message = f"Chain invocation failed: {detail}"
+        if status == 404:
+            return ChainEndpointNotFoundError(message)
+        if status in INPUT_REJECTED_STATUSES:
+            return ChainInputError(message)
+        if status == 429 or status == 503:
+            return RetryableChainError(
+                message,
+                overloaded=True,
+                retry_after=parse_retry_after(retry_after),
+            )
+        if status in (502, 504):
+            return RetryableChainError(message, upstream_down=True)
+        if status >= 500 and any(
+            m in detail.lower() for m in INPUT_REJECTED_MARKERS
+        ):
+            return ChainInputError(message)
+        if status >= 500:
+            # Provider errors are wrapped by LangServe into a plain 500
+            overloaded = any(m in detail.lower() for m in RATE_LIMIT_MARKERS)
+            return RetryableChainError(
+                message,
+                overloaded=overloaded,
+                retry_after=parse_retry_after(retry_after),
+            )
+        return ChainError(message)
+
+
+class InProcessExecutor(ChainExecutor):
+    """
+    Runs the chain runnables inside the main app process, skipping JSON
+    serialization, the HTTP hop and LangServe's input validation.
+    """
+
+    async def _get_runnable(self, chain_name: str) -> Any:
+        # Imported lazily, the LangServe dependencies are heavy
+        from langserver.registry import load_chain
+
+        try:
+            # Chain modules build their vector stores at import time
+            return await asyncio.to_thread(load_chain, chain_name)
+        except KeyError as e:
+            raise ChainEndpointNotFoundError(
+                f"Chain '{chain_name}' not found"
+            ) from e
+
+    async def batch(
+        self,
+        *,
+        chain_name: str,
+        inputs: List[str],
+        config_values: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Any, RunMetrics]]:
+        """Run the chain's `abatch` for the inputs, measuring every run."""
+        from langserver.callbacks import RunMetricsHandler
+
+        runnable = await self._get_runnable(chain_name)
+        handlers = [RunMetricsHandler() for _ in inputs]
+        try:
+            outputs = await runnable.abatch(
+                inputs,
+                config=[
+                    {
+                        "configurable": config_values or {},
+                        "metadata": metadata or {},
+                        "callbacks": [handler],
+                    }
+                    for handler in handlers
+                ],
+            )
+        except Exception as e:
+            raise self._classify_exception(e) from e
+        return [
+            (output, RunMetrics(**handler.metrics()))
+            for output, handler in zip(outputs, handlers)
+        ]
+
+    async def stream_events(
+        self,
+        *,
+        chain_name: str,
+        input: str,
+        config_values: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run the chain's `astream_events` for one input."""
+        runnable = await self._get_runnable(chain_name)
+        try:
+            async for event in runnable.astream_events(
+                input,
+                config={
+                    "configurable": config_values or {},
+                    "metadata": metadata or {},
+                },
+                version="v2",
+            ):
+                yield event
+        except Exception as e:
+            raise self._classify_exception(e) from e
+
+    def _classify_exception(self, error: Exception) -> ChainError:
+        """Map an exception raised by a chain to a (retryable) chain error."""
+        message = f"Chain invocation failed: {str(error)}"
+        if getattr(error, "status_code", None) == 429 or (
+            "RateLimit" in type(error).__name__
+        ):
+            response = getattr(error, "response", None)
+            headers = getattr(response, "headers", None) or {}
+            return RetryableChainError(
+                message,
+                overloaded=True,
+                retry_after=parse_retry_after(headers.get("retry-after")),
+            )
+        if isinstance(error, (ConnectionError, asyncio.TimeoutError)):
+            return RetryableChainError(message, upstream_down=True)
+        if getattr(error, "status_code", None) in INPUT_REJECTED_STATUSES:
+            return ChainInputError(message)
+        if isinstance(error, (ValueError, TypeError)):
+            # Includes the validation errors of the chain's input schema
+            return ChainInputError(message)
+        return ChainError(message)
+
+
+def create_chain_executor(
+    http: Optional[aiohttp.ClientSession] = None,
+    mode: str = CHAIN_EXECUTION_MODE,
+) -> ChainExecutor:
+    """Create the executor for the configured chain execution mode."""
+    if mode == "in_process":
+        logger.info("Running chains in process")
+        return InProcessExecutor()
+    if mode != "langserve":
+        raise ValueError(f"Unknown chain execution mode '{mode}'")
+    return LangServeExecutor(http)
@@ -0,0 +1,347 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from app.core.concurrency import FairSemaphore, Priority
+from app.core.config import JOB_HISTORY_LIMIT, JOB_WORKERS, MATRIX_CONCURRENCY
+from app.core.logger import get_logger
+from app.db.config import AsyncSessionLocal
+from app.models.chain import Chain
+from app.schemas.job import JobStatus
+from app.services.chain import ChainService, InvocationProgress
+from app.services.executor import ChainExecutor
+from app.services.exceptions import JobError, JobNotFoundError
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class InvocationJob:
+    """
+    In-memory state of a chain invocation running in the background. Matrix
+    jobs have no chain or configuration of their own and run their `cells`.
+    """
+
+    session_id: UUID
+    chain_id: Optional[UUID] = None
+    config_id: Optional[UUID] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+    question_set: Optional[str] = None
+    id: UUID = field(default_factory=uuid4)
+    status: JobStatus = JobStatus.PENDING
+    progress: InvocationProgress = field(default_factory=InvocationProgress)
+    errors: List[str] = field(default_factory=list)
+    answer_ids: List[UUID] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cells: List["InvocationJob"] = field(default_factory=list)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def is_matrix(self) -> bool:
+        return self.chain_id is None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (
+            JobStatus.COMPLETED,
+            JobStatus.FAILED,
+            JobStatus.CANCELLED,
+        )
+
+    @property
+    def key(self) -> Hashable:
+        """Identity of the work, equal for duplicate submissions."""
+        cells = tuple((cell.chain_id, cell.config_id) for cell in self.cells)
+        return (
+            self.session_id,
+            self.chain_id,
+            self.config_id,
+            cells,
+            self.question_set,
+            bool(self.options.get("missing_only")),
+            # Runs without the cache must not get the answers of one with it
+            bool(self.options.get("use_cache", True)),
+        )
+
+
+class JobManager:
+    """Queue of chain invocation jobs processed by a pool of asyncio workers."""
+
+    def __init__(
+        self,
+        *,
+        executor: Optional[ChainExecutor] = None,
+        workers: int = JOB_WORKERS,
+        history_limit: int = JOB_HISTORY_LIMIT,
+    ):
+        self.executor = executor
+        self.workers = workers
+        self.history_limit = history_limit
+        self._queue: asyncio.Queue[InvocationJob] = asyncio.Queue()
+        self._jobs: Dict[UUID, InvocationJob] = {}
+        self._active: Dict[Hashable, InvocationJob] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Spawn the worker tasks."""
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info(f"Started job queue with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks, abandoning any running jobs."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Stopped job queue")
+
+    def submit(
+        self,
+        *,
+        session_id: UUID,
+        chain_id: UUID,
+        config_id: UUID,
+        options: Optional[Dict[str, Any]] = None,
+        question_set: Optional[str] = None,
+    ) -> InvocationJob:
+        """
+        Enqueue a chain invocation and return its job right away. While a
+        job for the same session, chain, configuration, `question_set` and
+        cache options is pending or running, that job is returned instead.
+        """
+        job = InvocationJob(
+            session_id=session_id,
+            chain_id=chain_id,
+            config_id=config_id,
+            options=options or {},
+            question_set=question_set,
+        )
+        if existing := self._attach(job):
+            return existing
+        self._enqueue(job)
+        logger.info(
+            f"Queued job '{job.id}' for chain '{chain_id}' and "
+            f"configuration '{config_id}' ({self._queue.qsize()} pending)"
+        )
+        return job
+
+    def submit_matrix(
+        self,
+        *,
+        session_id: UUID,
+        cells: List[Tuple[UUID, UUID]],
+        options: Optional[Dict[str, Any]] = None,
+        question_set: Optional[str] = None,
+    ) -> InvocationJob:
+        """
+        Enqueue one job running all (chain, configuration) cells at once,
+        or return the active job doing the same work.
+        """
+        options = options or {}
+        job = InvocationJob(
+            session_id=session_id, options=options, question_set=question_set
+        )
+        job.cells = [
+            InvocationJob(
+                session_id=session_id,
+                chain_id=chain_id,
+                config_id=config_id,
+                options=options,
+                progress=InvocationProgress(parent=job.progress),
+            )
+            for chain_id, config_id in cells
+        ]
+        if existing := self._attach(job):
+            return existing
+        self._enqueue(job)
+        logger.info(
+            f"Queued matrix job '{job.id}' with {len(cells)} cells for "
+            f"session '{session_id}' ({self._queue.qsize()} pending)"
+        )
+        return job
+
+    def resume(self, job_id: UUID) -> InvocationJob:
+        """Enqueue a job that only generates answers an earlier job missed."""
+        job = self.get_job(job_id)
+        if not job.is_finished:
+            raise JobError(f"Job '{job_id}' is still {job.status.value}")
+        if job.is_matrix:
+            return self.submit_matrix(
+                session_id=job.session_id,
+                cells=[(cell.chain_id, cell.config_id) for cell in job.cells],
+                options={**job.options, "missing_only": True},
+                question_set=job.question_set,
+            )
+        return self.submit(
+            session_id=job.session_id,
+            chain_id=job.chain_id,
+            config_id=job.config_id,
+            options={**job.options, "missing_only": True},
+            question_set=job.question_set,
+        )
+
+    def cancel(self, job_id: UUID) -> InvocationJob:
+        """
+        Cancel a pending or running job. Outstanding LangServe requests are
+        aborted and answers the job already saved are kept, so the job can
+        be resumed later.
+        """
+        job = self.get_job(job_id)
+        if job.is_finished:
+            raise JobError(f"Job '{job_id}' is already {job.status.value}")
+        if job.task:
+            job.task.cancel()
+        else:
+            # Still queued, the worker skips it
+            self._mark_cancelled(job)
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+        logger.info(f"Cancelled job '{job_id}'")
+        return job
+
+    def get_job(self, job_id: UUID) -> InvocationJob:
+        """Get a job by ID."""
+        job = self._jobs.get(job_id)
+        if not job:
+            raise JobNotFoundError(f"Job '{job_id}' not found")
+        return job
+
+    def list_jobs(
+        self, session_id: Optional[UUID] = None
+    ) -> List[InvocationJob]:
+        """List known jobs, newest first, optionally filtered by session."""
+        jobs = [
+            job
+            for job in self._jobs.values()
+            if session_id is None or job.session_id == session_id
+        ]
+        return list(reversed(jobs))
+
+    def _attach(self, job: InvocationJob) -> Optional[InvocationJob]:
+        """Find an active job doing the same work as `job`."""
+        existing = self._active.get(job.key)
+        if existing and not existing.is_finished:
+            logger.info(
+                f"Attached duplicate submission to active job '{existing.id}'"
+            )
+            return existing
+        return None
+
+    def _enqueue(self, job: InvocationJob) -> None:
+        self._jobs[job.id] = job
+        self._active[job.key] = job
+        self._queue.put_nowait(job)
+        self._prune()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit."""
+        finished = [job for job in self._jobs.values() if job.is_finished]
+        for job in finished[: max(0, len(finished) - self.history_limit)]:
+            del self._jobs[job.id]
+
+    def _mark_cancelled(self, job: InvocationJob) -> None:
+        for unfinished in [job, *job.cells]:
+            if not unfinished.is_finished:
+                unfinished.status = JobStatus.CANCELLED
+                unfinished.finished_at = datetime.now()
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if not job.is_finished:
+                    job.task = asyncio.create_task(
+                        self._run_matrix(job)
+                        if job.is_matrix
+                        else self._run(job)
+                    )
+                    # A cancelled job ends its own task, not the worker
+                    await asyncio.gather(job.task, return_exceptions=True)
+                    if job.task.cancelled():
+                        self._mark_cancelled(job)
+            finally:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+                self._queue.task_done()
+
+    async def _run_matrix(self, job: InvocationJob) -> None:
+        """Run all cells concurrently under one fair concurrency budget."""
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now()
+        budget = job.options.get("max_concurrency") or MATRIX_CONCURRENCY
+        limiter = FairSemaphore(budget)
+        logger.info(
+            f"Running matrix job '{job.id}' with {len(job.cells)} cells and "
+            f"{budget} requests in flight"
+        )
+
+        try:
+            await asyncio.gather(
+                *(
+                    self._run(cell, max_concurrency=budget, limiter=limiter)
+                    for cell in job.cells
+                )
+            )
+        except asyncio.CancelledError:
+            self._mark_cancelled(job)
+            logger.info(
+                f"Matrix job '{job.id}' cancelled "
+                f"({job.progress.completed}/{job.progress.total} answers)"
+            )
+            raise
+
+        for cell in job.cells:
+            job.answer_ids.extend(cell.answer_ids)
+            job.errors.extend(
+                f"Chain '{cell.chain_id}', configuration "
+                f"'{cell.config_id}': {error}"
+                for error in cell.errors
+            )
+        job.status = JobStatus.FAILED if job.errors else JobStatus.COMPLETED
+        job.finished_at = datetime.now()
+        elapsed = (job.finished_at - job.started_at).total_seconds()
+        logger.info(
+            f"Matrix job '{job.id}' {job.status.value} in {elapsed:.3f}s "
+            f"({job.progress.completed}/{job.progress.total} answers)"
+        )
+
+    async def _run(self, job: InvocationJob, **invoke_kwargs: Any) -> None:
+        """Execute a job with its own database session."""
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now()
+        logger.info(f"Running job '{job.id}'")
+        try:
+            async with AsyncSessionLocal() as db:
+                service = ChainService(Chain, db, self.executor)
+                answers = await service.invoke_chain_batch(
+                    session_id=job.session_id,
+                    chain_id=job.chain_id,
+                    config_id=job.config_id,
+                    progress=job.progress,
+                    # Background jobs never delay interactive requests
+                    priority=Priority.BULK,
+                    **{**job.options, **invoke_kwargs},
+                )
+                job.answer_ids = [answer.id for answer in answers]
+            job.status = JobStatus.COMPLETED
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+            raise
+        except Exception as e:
+            job.errors.append(str(e))
+            job.status = JobStatus.FAILED
+            logger.error(f"Job '{job.id}' failed: {str(e)}", exc_info=True)
+        finally:
+            job.finished_at = datetime.now()
+            elapsed = (job.finished_at - job.started_at).total_seconds()
+            logger.info(
+                f"Job '{job.id}' {job.status.value} in {elapsed:.3f}s "
+                f"({job.progress.completed}/{job.progress.total} answers)"
+            )
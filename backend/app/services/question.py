@@ -1,10 +1,11 @@
-from typing import List, Type
+from typing import List, Optional, Type
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import exists, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.logger import get_logger
+from app.models.answer import Answer
 from app.models.question import Question
 from app.models.session import Session
 from app.services.base import BaseService
@@ -104,13 +105,36 @@ class QuestionService(BaseService[Question]):
             )
             raise QuestionError("Failed to create questions in bulk") from e
 
-    async def get_session_questions(self, session_id: UUID) -> List[Question]:
-        """Get all questions for a specific session."""
+    async def _validate_question_ids(
+        self, *, session_id: UUID, question_ids: List[UUID]
+    ) -> None:
+        """Validate that all given questions belong to the session."""
+        query = select(self.model.id).where(
+            self.model.session_id == session_id,
+            self.model.id.in_(question_ids),
+        )
+        result = await self.db.execute(query)
+        missing = set(question_ids) - set(result.scalars().all())
+        if missing:
+            raise QuestionNotFoundError(
+                f"Questions not found in session '{session_id}': "
+                f"{', '.join(str(question_id) for question_id in missing)}"
+            )
+
+    async def get_session_questions(
+        self, session_id: UUID, question_ids: Optional[List[UUID]] = None
+    ) -> List[Question]:
+        """Get all questions for a specific session, or the given subset."""
         try:
             await self._validate_session(session_id)
             query = select(self.model).where(
                 self.model.session_id == session_id
             )
+            if question_ids is not None:
+                await self._validate_question_ids(
+                    session_id=session_id, question_ids=question_ids
+                )
+                query = query.where(self.model.id.in_(question_ids))
             result = await self.db.execute(query)
             questions = list(result.scalars().all())
             logger.info(
@@ -121,6 +145,44 @@ class QuestionService(BaseService[Question]):
             logger.error(f"Database error while fetching questions: {str(e)}")
             raise QuestionError("Failed to fetch questions") from e
 
+    async def get_unanswered_questions(
+        self,
+        session_id: UUID,
+        *,
+        chain_id: UUID,
+        configuration_id: UUID,
+        question_ids: Optional[List[UUID]] = None,
+    ) -> List[Question]:
+        """
+        Get the session questions (or the given subset) that have no answer
+        yet for a chain configuration, using one anti-join on answers.
+        """
+        try:
+            await self._validate_session(session_id)
+            answered = exists().where(
+                Answer.question_id == self.model.id,
+                Answer.chain_id == chain_id,
+                Answer.configuration_id == configuration_id,
+            )
+            query = select(self.model).where(
+                self.model.session_id == session_id, ~answered
+            )
+            if question_ids is not None:
+                await self._validate_question_ids(
+                    session_id=session_id, question_ids=question_ids
+                )
+                query = query.where(self.model.id.in_(question_ids))
+            result = await self.db.execute(query)
+            questions = list(result.scalars().all())
+            logger.info(
+                f"Retrieved {len(questions)} unanswered questions for "
+                f"session '{session_id}'"
+            )
+            return questions
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while fetching questions: {str(e)}")
+            raise QuestionError("Failed to fetch questions") from e
+
     async def update_question(
         self, *, session_id: UUID, question_id: UUID, data: QuestionUpdate
     ) -> Question:
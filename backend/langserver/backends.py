@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+
+# Backends the chains can run on, selected with `LLM_BACKEND`
+LLM_BACKENDS = ("openai", "fake")
+
+# Distributions of the fake chat model's latency and token rate
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+# Words the fake chat model builds its answers from
+FAKE_VOCABULARY = (
+    "the context answer retrieval document model chain question evidence "
+    "source relevant result because however therefore data system query "
+    "vector index"
+).split()
+
+
+def sample(
+    rng: random.Random, mean: float, jitter: float, distribution: str
+) -> float:
+    """Draw a non-negative value around `mean` with a spread of `jitter`."""
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{distribution}'")
+    if distribution == "fixed" or jitter <= 0 or mean <= 0:
+        return max(0.0, mean)
+    if distribution == "uniform":
+        return max(0.0, rng.uniform(mean - jitter, mean + jitter))
+    if distribution == "normal":
+        return max(0.0, rng.gauss(mean, jitter))
+    # Median at `mean`, long tail to the right like real provider latency
+    return rng.lognormvariate(math.log(mean), jitter / mean)
+
+
+@dataclass
+class _Generation:
+    tokens: List[str]
+    prompt_tokens: int
+    first_token_delay: float
+    token_delay: float
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model with deterministic answers and simulated latency.
+
+    The answer, time to first token and token rate of a call only depend on
+    the prompt, `model_name` and `seed`, so repeated benchmark runs see the
+    same work. Streams token by token and reports token usage like the
+    OpenAI models. `temperature` is accepted for chains that configure it
+    and ignored.
+    """
+
+    model_name: str = "fake-chat"
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    output_tokens: int = 64
+    latency_ms: float = 300.0
+    latency_jitter_ms: float = 0.0
+    tokens_per_second: float = 50.0
+    tokens_per_second_jitter: float = 0.0
+    distribution: str = "fixed"
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "seed": self.seed}
+
+    def _plan(self, messages: List[BaseMessage]) -> _Generation:
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(
+            f"{self.seed}:{self.model_name}:{prompt}".encode()
+        ).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+
+        count = self.output_tokens
+        if self.max_tokens is not None:
+            count = min(count, self.max_tokens)
+        words = [rng.choice(FAKE_VOCABULARY) for _ in range(max(count, 1))]
+        latency_ms = sample(
+            rng, self.latency_ms, self.latency_jitter_ms, self.distribution
+        )
+        rate = sample(
+            rng,
+            self.tokens_per_second,
+            self.tokens_per_second_jitter,
+            self.distribution,
+        )
+        return _Generation(
+            tokens=[words[0]] + [f" {word}" for word in words[1:]],
+            prompt_tokens=len(prompt.split()),
+            first_token_delay=latency_ms / 1000,
+            token_delay=1 / rate if rate > 0 else 0.0,
+        )
+
+    def _message(self, generation: _Generation) -> AIMessage:
+        return AIMessage(
+            content="".join(generation.tokens),
+            usage_metadata=self._usage(generation),
+            response_metadata={"model_name": self.model_name},
+        )
+
+    def _last_chunk(self, generation: _Generation) -> ChatGenerationChunk:
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata=self._usage(generation),
+                response_metadata={"model_name": self.model_name},
+            )
+        )
+
+    def _usage(self, generation: _Generation) -> Dict[str, int]:
+        completion_tokens = len(generation.tokens)
+        return {
+            "input_tokens": generation.prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": generation.prompt_tokens + completion_tokens,
+        }
+
+    def _total_delay(self, generation: _Generation) -> float:
+        return generation.first_token_delay + generation.token_delay * (
+            len(generation.tokens) - 1
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        generation = self._plan(messages)
+        time.sleep(self._total_delay(generation))
+        return ChatResult(
+            generations=[ChatGeneration(message=self._message(generation))],
+            llm_output={"model_name": self.model_name},
+        )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        generation = self._plan(messages)
+        await asyncio.sleep(self._total_delay(generation))
+        return ChatResult(
+            generations=[ChatGeneration(message=self._message(generation))],
+            llm_output={"model_name": self.model_name},
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        generation = self._plan(messages)
+        time.sleep(generation.first_token_delay)
+        for i, token in enumerate(generation.tokens):
+            if i:
+                time.sleep(generation.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield self._last_chunk(generation)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        generation = self._plan(messages)
+        await asyncio.sleep(generation.first_token_delay)
+        for i, token in enumerate(generation.tokens):
+            if i:
+                await asyncio.sleep(generation.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield self._last_chunk(generation)
+
+
+def get_llm_backend() -> str:
+    """The backend selected with `LLM_BACKEND`, read when a chain loads."""
+    backend = os.getenv("LLM_BACKEND", "openai")
+    if backend not in LLM_BACKENDS:
+        raise ValueError(
+            f"Unknown LLM backend '{backend}', "
+            f"expected one of {', '.join(LLM_BACKENDS)}"
+        )
+    return backend
+
+
+def chat_model(model: Optional[str] = None, **kwargs: Any) -> BaseChatModel:
+    """
+    Chat model of the selected backend. `model` is the OpenAI model name,
+    which the fake backend uses as its model name to vary its answers.
+    """
+    if get_llm_backend() == "fake":
+        return FakeChatModel(
+            model_name=model or "fake-chat",
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "64")),
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "300")),
+            latency_jitter_ms=float(
+                os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0")
+            ),
+            tokens_per_second=float(
+                os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50")
+            ),
+            tokens_per_second_jitter=float(
+                os.getenv("FAKE_LLM_TOKENS_PER_SECOND_JITTER", "0")
+            ),
+            distribution=os.getenv("FAKE_LLM_DISTRIBUTION", "fixed"),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+            **kwargs,
+        )
+
+    from langchain_openai import ChatOpenAI
+
+    if model:
+        kwargs["model"] = model
+    # Report token usage when streaming too
+    return ChatOpenAI(stream_usage=True, **kwargs)
+
+
+def embeddings() -> Embeddings:
+    """
+    Embedding model of the selected backend, behind the shared embedding
+    cache unless `EMBEDDING_CACHE` is off.
+    """
+    if get_llm_backend() == "fake":
+        # Vectors are seeded by the text, like real embeddings of it
+        model: Embeddings = DeterministicFakeEmbedding(
+            size=int(os.getenv("FAKE_EMBEDDING_SIZE", "1536"))
+        )
+    else:
+        from langchain_openai import OpenAIEmbeddings
+
+        model = OpenAIEmbeddings()
+
+    if os.getenv("EMBEDDING_CACHE", "true").lower() != "true":
+        return model
+
+    from langserver.embedding_cache import (
+        CachedEmbeddings,
+        shared_embedding_cache,
+    )
+
+    return CachedEmbeddings(model, shared_embedding_cache())
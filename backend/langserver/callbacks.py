@@ -0,0 +1,89 @@
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+class RunMetricsHandler(BaseCallbackHandler):
+    """
+    Measures one chain run: wall time, time to the first generated token and
+    the token usage and model name of its model calls. Token usage is summed
+    over all model calls, the model name is the one of the last call.
+    """
+
+    # Record timestamps on the event loop, not in an executor thread
+    run_inline = True
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.ended_at: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.model_name: Optional[str] = None
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        if parent_run_id is None and self.started_at is None:
+            self.started_at = time.perf_counter()
+
+    def on_chain_end(
+        self,
+        outputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        if parent_run_id is None:
+            self.ended_at = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        if usage:
+            self._add_tokens(usage["input_tokens"], usage["output_tokens"])
+        elif llm_output.get("token_usage"):
+            token_usage = llm_output["token_usage"]
+            self._add_tokens(
+                token_usage.get("prompt_tokens", 0),
+                token_usage.get("completion_tokens", 0),
+            )
+        self.model_name = llm_output.get("model_name") or self.model_name
+
+    def _add_tokens(self, prompt: int, completion: int) -> None:
+        self.prompt_tokens = (self.prompt_tokens or 0) + prompt
+        self.completion_tokens = (self.completion_tokens or 0) + completion
+
+    def metrics(self) -> Dict[str, Any]:
+        """Collected metrics, times in milliseconds since the run started."""
+
+        def since_start(timestamp: Optional[float]) -> Optional[int]:
+            if timestamp is None or self.started_at is None:
+                return None
+            return round((timestamp - self.started_at) * 1000)
+
+        return {
+            "latency_ms": since_start(self.ended_at),
+            "ttft_ms": since_start(self.first_token_at),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "model_name": self.model_name,
+        }
@@ -1,4 +1,3 @@
-from langchain_community.vectorstores import FAISS
 from langchain_core.runnables import (
     Runnable,
     ConfigurableField,
@@ -7,7 +6,11 @@ from langchain_core.runnables import (
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain.schema import Document
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langserver.backends import chat_model, embeddings
+from langserver.llm_cache import with_llm_cache
+from langserver.memo import memoize
+from langserver.retrievers import BM25Retriever, HybridRetriever
+from langserver.vectorstores import load_or_build_faiss, tunable_retriever
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,28 +32,57 @@ reformulation_prompt = ChatPromptTemplate.from_template(
 
 
 # 1. Query Reformulation model
-reformulation_model = ChatOpenAI(
-    model="gpt-4o-mini"
-).configurable_alternatives(
-    ConfigurableField(
-        id="reformulation_model",
-        name="Reformulation Model",
-        description="Model to use for query reformulation",
-    ),
-    gpt_35_turbo=ChatOpenAI(model="gpt-3.5-turbo"),
-    default_key="gpt_4o_mini",
+# Both models cache their responses if configured with `llm_cache`
+reformulation_model = with_llm_cache(
+    chat_model("gpt-4o-mini").configurable_alternatives(
+        ConfigurableField(
+            id="reformulation_model",
+            name="Reformulation Model",
+            description="Model to use for query reformulation",
+        ),
+        gpt_35_turbo=chat_model("gpt-3.5-turbo"),
+        default_key="gpt_4o_mini",
+    )
 )
 
 
 # 2. Document Retriever
-vector_store = FAISS.from_documents(sample_docs, embedding=OpenAIEmbeddings())
+vector_store = load_or_build_faiss(
+    "complex_configurable_chain", sample_docs, embeddings()
+)
 
-retriever = vector_store.as_retriever().configurable_fields(
-    search_kwargs=ConfigurableField(
-        id="search_kwargs_faiss",
-        name="Search Kwargs",
-        description="The search kwargs to use",
+# The search kwargs apply to whichever retriever is selected
+search_kwargs = ConfigurableField(
+    id="search_kwargs_faiss",
+    name="Search Kwargs",
+    description="The search kwargs to use",
+)
+faiss_retriever = tunable_retriever(vector_store)
+bm25_retriever = BM25Retriever.from_store(vector_store)
+
+retriever = faiss_retriever.configurable_fields(
+    search_kwargs=search_kwargs,
+    nprobe=ConfigurableField(
+        id="faiss_nprobe",
+        name="FAISS nprobe",
+        description="IVF clusters searched, higher finds more but slower",
+    ),
+    ef_search=ConfigurableField(
+        id="faiss_ef_search",
+        name="FAISS efSearch",
+        description="HNSW candidates searched, higher finds more but slower",
     ),
+).configurable_alternatives(
+    ConfigurableField(
+        id="retriever",
+        name="Retriever",
+        description="Dense FAISS, lexical BM25 or both fused with RRF",
+    ),
+    default_key="faiss",
+    bm25=bm25_retriever.configurable_fields(search_kwargs=search_kwargs),
+    hybrid=HybridRetriever(
+        dense=faiss_retriever, sparse=bm25_retriever
+    ).configurable_fields(search_kwargs=search_kwargs),
 )
 
 # 3. Answer generation prompt template. TODO: Make this configurable
@@ -73,22 +105,24 @@ configurable_answer_prompt = PromptTemplate.from_template(
 custom_prompt = ChatPromptTemplate.from_template(template=answer_prompt)
 
 # 4. Answer generation model
-generation_model = ChatOpenAI(model="gpt-4o-mini").configurable_fields(
-    model_name=ConfigurableField(
-        id="generation_model",
-        name="Generation Model",
-        description="Model to use for final generation",
-    ),
-    temperature=ConfigurableField(
-        id="generation_temperature",
-        name="Generation Temperature",
-        description="Temperature for generation",
-    ),
-    max_tokens=ConfigurableField(
-        id="generation_max_tokens",
-        name="Generation Max Tokens",
-        description="Max Tokens for generation",
-    ),
+generation_model = with_llm_cache(
+    chat_model("gpt-4o-mini").configurable_fields(
+        model_name=ConfigurableField(
+            id="generation_model",
+            name="Generation Model",
+            description="Model to use for final generation",
+        ),
+        temperature=ConfigurableField(
+            id="generation_temperature",
+            name="Generation Temperature",
+            description="Temperature for generation",
+        ),
+        max_tokens=ConfigurableField(
+            id="generation_max_tokens",
+            name="Generation Max Tokens",
+            description="Max Tokens for generation",
+        ),
+    )
 )
 
 
@@ -109,10 +143,14 @@ rag_chain: Runnable = (
     {
         # 1. Reformulate the user query
         "question": RunnablePassthrough(),
-        "reformulated_query": reformulation_prompt | reformulation_model,
+        # Reformulation and retrieval are reused by configurations that
+        # only differ in generation settings
+        "reformulated_query": memoize(
+            reformulation_prompt | reformulation_model, "reformulation"
+        ),
     }
     | {
-        "context": retriever,
+        "context": memoize(retriever, "retrieval"),
     }
     | (configurable_answer_prompt | generation_model | custom_parser)
 )
@@ -125,6 +163,7 @@ configured_chain = rag_chain.with_config(
         "generation_model": "gpt-4o-mini",
         "generation_temperature": 1,
         "generation_max_tokens": 10,
+        "llm_cache": "off",  # Alternatives - "exact", "semantic"
         "output_parser": "str_parser",  # Alternative - "json_parser"
     }
 )
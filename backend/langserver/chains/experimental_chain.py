@@ -1,4 +1,3 @@
-from langchain_community.vectorstores import FAISS
 from langchain_core.runnables import (
     Runnable,
     ConfigurableField,
@@ -7,7 +6,11 @@ from langchain_core.runnables import (
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain.schema import Document
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langserver.backends import chat_model, embeddings
+from langserver.llm_cache import with_llm_cache
+from langserver.memo import memoize
+from langserver.retrievers import BM25Retriever, HybridRetriever
+from langserver.vectorstores import load_or_build_faiss, tunable_retriever
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,13 +26,41 @@ documents = [
 ]
 
 # 1. Document retriever
-vector_store = FAISS.from_documents(documents, embedding=OpenAIEmbeddings())
-retriever = vector_store.as_retriever().configurable_fields(
-    search_kwargs=ConfigurableField(
-        id="search_kwargs_faiss",
-        name="Top K Documents",
-        description="Number of most relevant documents to retrieve",
+vector_store = load_or_build_faiss(
+    "experimental_chain", documents, embeddings()
+)
+# The search kwargs apply to whichever retriever is selected
+search_kwargs = ConfigurableField(
+    id="search_kwargs_faiss",
+    name="Top K Documents",
+    description="Number of most relevant documents to retrieve",
+)
+faiss_retriever = tunable_retriever(vector_store)
+bm25_retriever = BM25Retriever.from_store(vector_store)
+
+retriever = faiss_retriever.configurable_fields(
+    search_kwargs=search_kwargs,
+    nprobe=ConfigurableField(
+        id="faiss_nprobe",
+        name="FAISS nprobe",
+        description="IVF clusters searched, higher finds more but slower",
+    ),
+    ef_search=ConfigurableField(
+        id="faiss_ef_search",
+        name="FAISS efSearch",
+        description="HNSW candidates searched, higher finds more but slower",
     ),
+).configurable_alternatives(
+    ConfigurableField(
+        id="retriever",
+        name="Retriever",
+        description="Dense FAISS, lexical BM25 or both fused with RRF",
+    ),
+    default_key="faiss",
+    bm25=bm25_retriever.configurable_fields(search_kwargs=search_kwargs),
+    hybrid=HybridRetriever(
+        dense=faiss_retriever, sparse=bm25_retriever
+    ).configurable_fields(search_kwargs=search_kwargs),
 )
 
 # 2. Answer generation prompt template options.
@@ -56,20 +87,20 @@ configurable_answer_prompt = PromptTemplate.from_template(
 )
 
 # 3. Answer generation model
-configurable_generation_model = ChatOpenAI(
-    model="gpt-4o-mini"
-).configurable_fields(
-    max_tokens=ConfigurableField(
-        id="generation_max_tokens",
-        name="Generation Max Tokens",
-        description="Max Tokens allowed for answer generation",
-    ),
+configurable_generation_model = with_llm_cache(
+    chat_model("gpt-4o-mini").configurable_fields(
+        max_tokens=ConfigurableField(
+            id="generation_max_tokens",
+            name="Generation Max Tokens",
+            description="Max Tokens allowed for answer generation",
+        ),
+    )
 )
 
 # Full RAG chain
 chain: Runnable = (
     RunnablePassthrough()
-    | {"context": retriever, "question": lambda x: x}
+    | {"context": memoize(retriever, "retrieval"), "question": lambda x: x}
     | configurable_answer_prompt
     | configurable_generation_model
     | StrOutputParser()
@@ -1,4 +1,5 @@
-from langchain_openai import ChatOpenAI
+from langserver.backends import chat_model
+from langserver.llm_cache import with_llm_cache
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
@@ -15,7 +16,7 @@ load_dotenv()
 # )
 
 
-model = ChatOpenAI()
+model = with_llm_cache(chat_model())
 
 prompt = PromptTemplate.from_template("tell me a joke about {topic}.")
 
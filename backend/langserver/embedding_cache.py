@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from langserver.vectorstores import (
+    embedding_identity,
+    embeds_queries_as_documents,
+)
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by all chains and LangServe workers
+EMBEDDING_CACHE_PATH = Path(
+    os.getenv(
+        "EMBEDDING_CACHE_PATH",
+        Path(__file__).resolve().parent / ".embedding_cache.sqlite",
+    )
+)
+EMBEDDING_CACHE_MAX_BYTES = int(
+    float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024
+)  # Least recently used vectors are evicted beyond this size
+
+# Keeps each statement below SQLite's limit of bound parameters
+_LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Vectors by content hash in a SQLite file, evicted least recently used
+    beyond `max_bytes`. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._create_schema()
+            self._db.execute("COMMIT")
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _create_schema(self) -> None:
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "vector BLOB NOT NULL, "
+            "size_bytes INTEGER NOT NULL, "
+            "last_accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_accessed "
+            "ON embeddings (last_accessed)"
+        )
+        # Total size kept up to date by triggers, so writes can check the
+        # limit without scanning the table
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache_size ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), "
+            "size_bytes INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO cache_size (id, size_bytes) "
+            "SELECT 0, COALESCE(SUM(size_bytes), 0) FROM embeddings"
+        )
+        self._db.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_size_insert "
+            "AFTER INSERT ON embeddings BEGIN "
+            "UPDATE cache_size SET size_bytes = size_bytes + NEW.size_bytes; "
+            "END"
+        )
+        self._db.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_size_delete "
+            "AFTER DELETE ON embeddings BEGIN "
+            "UPDATE cache_size SET size_bytes = size_bytes - OLD.size_bytes; "
+            "END"
+        )
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Look up vectors and mark the hits as recently used."""
+        hits: Dict[str, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), _LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start : start + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings "
+                    f"WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, vector in rows:
+                    hits[key] = np.frombuffer(
+                        vector, dtype=np.float64
+                    ).tolist()
+                if rows:
+                    self._db.execute(
+                        f"UPDATE embeddings SET last_accessed = ? "
+                        f"WHERE key IN ({placeholders})",
+                        [time.time(), *batch],
+                    )
+        return hits
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """Store vectors by key and evict beyond the size limit."""
+        if not vectors:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in vectors.items():
+            blob = np.asarray(vector, dtype=np.float64).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings "
+                    "(key, vector, size_bytes, last_accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict()
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        """Delete least recently used entries beyond the size limit."""
+        # Ranking all entries is only worth it once over the limit
+        (size,) = self._db.execute(
+            "SELECT size_bytes FROM cache_size"
+        ).fetchone()
+        if size <= self.max_bytes:
+            return
+        deleted = self._db.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM ("
+            "SELECT key, SUM(size_bytes) OVER "
+            "(ORDER BY last_accessed DESC, key) AS running_size "
+            "FROM embeddings) WHERE running_size > ?)",
+            (self.max_bytes,),
+        ).rowcount
+        if deleted:
+            logger.info(f"Evicted {deleted} embedding cache entries")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings that are looked up in an `EmbeddingCache` by a hash of the
+    text and the embedding model before asking `underlying_embeddings`.
+    Covers documents and queries, so only texts never embedded with the
+    same model cost an embedding call.
+    """
+
+    def __init__(
+        self, underlying_embeddings: Embeddings, cache: EmbeddingCache
+    ):
+        self.underlying_embeddings = underlying_embeddings
+        self.cache = cache
+        self.namespace = json.dumps(
+            embedding_identity(underlying_embeddings), sort_keys=True
+        )
+
+    def _key(self, kind: str, text: str) -> str:
+        # Some models embed queries differently from documents
+        return hashlib.sha256(
+            f"{self.namespace}\n{kind}\n{text}".encode()
+        ).hexdigest()
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        try:
+            hits = self.cache.get_many(keys)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read embedding cache: {e}")
+            hits = {}
+        # Embed every missing text once, even if it occurs several times
+        missing = list(
+            dict.fromkeys(
+                text for text, key in zip(texts, keys) if key not in hits
+            )
+        )
+        return keys, hits, missing
+
+    def _store(
+        self,
+        kind: str,
+        hits: Dict[str, List[float]],
+        missing: List[str],
+        vectors: List[List[float]],
+    ) -> None:
+        new_vectors = {
+            self._key(kind, text): vector
+            for text, vector in zip(missing, vectors)
+        }
+        hits.update(new_vectors)
+        try:
+            self.cache.put_many(new_vectors)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write embedding cache: {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, hits, missing = self._lookup("document", texts)
+        if missing:
+            vectors = self.underlying_embeddings.embed_documents(missing)
+            self._store("document", hits, missing, vectors)
+        return [hits[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # SQLite may wait for another writer, off the event loop
+        keys, hits, missing = await asyncio.to_thread(
+            self._lookup, "document", texts
+        )
+        if missing:
+            vectors = await self.underlying_embeddings.aembed_documents(
+                missing
+            )
+            await asyncio.to_thread(
+                self._store, "document", hits, missing, vectors
+            )
+        return [hits[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, hits, missing = self._lookup("query", [text])
+        if missing:
+            vector = self.underlying_embeddings.embed_query(text)
+            self._store("query", hits, missing, [vector])
+        return hits[keys[0]]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, hits, missing = await asyncio.to_thread(
+            self._lookup, "query", [text]
+        )
+        if missing:
+            vector = await self.underlying_embeddings.aembed_query(text)
+            await asyncio.to_thread(
+                self._store, "query", hits, missing, [vector]
+            )
+        return hits[keys[0]]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed queries, the missing ones in one call if the model can."""
+        keys, hits, missing = self._lookup("query", texts)
+        if missing:
+            model = self.underlying_embeddings
+            if embeds_queries_as_documents(model):
+                vectors = model.embed_documents(missing)
+            else:
+                vectors = [model.embed_query(text) for text in missing]
+            self._store("query", hits, missing, vectors)
+        return [hits[key] for key in keys]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys, hits, missing = await asyncio.to_thread(
+            self._lookup, "query", texts
+        )
+        if missing:
+            model = self.underlying_embeddings
+            if embeds_queries_as_documents(model):
+                vectors = await model.aembed_documents(missing)
+            else:
+                vectors = await asyncio.gather(
+                    *(model.aembed_query(text) for text in missing)
+                )
+            await asyncio.to_thread(
+                self._store, "query", hits, missing, vectors
+            )
+        return [hits[key] for key in keys]
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_embedding_cache() -> EmbeddingCache:
+    """The cache at `EMBEDDING_CACHE_PATH`, opened once per process."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache(
+                EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES
+            )
+        return _shared_cache
@@ -0,0 +1,404 @@
+"""
+Ingest a directory of text files into a named FAISS vector store, e.g.
+
+    python -m langserver.ingest ./corpus --store my_corpus
+
+Files are chunked in worker processes and the chunks embedded in batches
+with several requests in flight, so only the chunks of the batches in
+progress are held in memory besides the store itself. A manifest of the
+ingested files is saved with the store, and ingesting the directory again
+only processes new, changed and removed files. Chains load the store with
+`langserver.vectorstores.load_vector_store`.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from langserver.vectorstores import (
+    INDEX_TYPES,
+    VECTOR_STORE_DIR,
+    IndexSpec,
+    convert_index,
+    embedding_identity,
+    load_faiss,
+    save_faiss,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+INGEST_EMBEDDING_BATCH_SIZE = int(
+    os.getenv("INGEST_EMBEDDING_BATCH_SIZE", "256")
+)  # Chunks per embedding request
+INGEST_EMBEDDING_CONCURRENCY = int(
+    os.getenv("INGEST_EMBEDDING_CONCURRENCY", "4")
+)  # Embedding requests in flight
+
+
+@dataclass
+class IngestReport:
+    """What an ingestion run did."""
+
+    store: str
+    files_scanned: int = 0
+    files_added: int = 0
+    files_changed: int = 0
+    files_unchanged: int = 0
+    files_removed: int = 0
+    chunks_added: int = 0
+    chunks_removed: int = 0
+    chunks_embedded: int = 0  # Less than added by duplicate chunks
+    seconds: float = 0.0
+
+
+@dataclass
+class _Chunk:
+    id: str
+    text: str
+    metadata: Dict[str, Any]
+
+
+# Text splitter of a worker process, created once by `_init_worker`
+_splitter = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int) -> None:
+    global _splitter
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    _splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def _chunk_file(path: str) -> Tuple[str, List[str]]:
+    """Hash and split one file, runs in a worker process."""
+    data = Path(path).read_bytes()
+    text = data.decode("utf-8", errors="replace")
+    return hashlib.sha256(data).hexdigest(), _splitter.split_text(text)
+
+
+def read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    """Manifest of an ingested store, if there is a complete one."""
+    try:
+        return json.loads((path / MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def scan_directory(
+    directory: Path, patterns: Sequence[str]
+) -> Dict[str, os.stat_result]:
+    """Files below `directory` matching any pattern, by relative path."""
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in names:
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                path = Path(root) / name
+                files[path.relative_to(directory).as_posix()] = path.stat()
+    return files
+
+
+def _chunk_id(source: str, file_hash: str, index: int) -> str:
+    # Unique per file version, so a changed file's new chunks can be added
+    # before its old ones are deleted
+    return hashlib.sha256(
+        f"{source}\n{file_hash}\n{index}".encode()
+    ).hexdigest()
+
+
+class _Ingestion:
+    """State of one ingestion run."""
+
+    def __init__(
+        self,
+        store: Optional[FAISS],
+        embedding: Embeddings,
+        report: IngestReport,
+        batch_size: int,
+        concurrency: int,
+    ):
+        self.store = store
+        self.embedding = embedding
+        self.report = report
+        self.batch_size = batch_size
+        self.slots = asyncio.Semaphore(concurrency)
+        self.batch: List[_Chunk] = []
+        self.tasks: List[asyncio.Task] = []
+
+    async def add(self, chunks: List[_Chunk]) -> None:
+        for chunk in chunks:
+            self.batch.append(chunk)
+            if len(self.batch) >= self.batch_size:
+                await self._flush()
+
+    async def finish(self) -> None:
+        if self.batch:
+            await self._flush()
+        await asyncio.gather(*self.tasks)
+
+    async def _flush(self) -> None:
+        batch, self.batch = self.batch, []
+        # Waiting for a slot holds back chunking, which bounds memory use
+        await self.slots.acquire()
+        self.tasks.append(asyncio.create_task(self._embed(batch)))
+        failed = [
+            task for task in self.tasks if task.done() and task.exception()
+        ]
+        if failed:
+            raise failed[0].exception()
+        self.tasks = [task for task in self.tasks if not task.done()]
+
+    async def _embed(self, batch: List[_Chunk]) -> None:
+        try:
+            # Embed every distinct text of the batch once
+            texts = list(dict.fromkeys(chunk.text for chunk in batch))
+            vectors = dict(
+                zip(texts, await self.embedding.aembed_documents(texts))
+            )
+        finally:
+            self.slots.release()
+        self.report.chunks_embedded += len(texts)
+
+        text_embeddings = [
+            (chunk.text, vectors[chunk.text]) for chunk in batch
+        ]
+        metadatas = [chunk.metadata for chunk in batch]
+        ids = [chunk.id for chunk in batch]
+        if self.store is None:
+            self.store = FAISS.from_embeddings(
+                text_embeddings, self.embedding, metadatas=metadatas, ids=ids
+            )
+        else:
+            self.store.add_embeddings(text_embeddings, metadatas, ids=ids)
+        self.report.chunks_added += len(batch)
+
+
+async def ingest_directory(
+    directory: Path,
+    store_name: str,
+    *,
+    embedding: Optional[Embeddings] = None,
+    patterns: Sequence[str] = DEFAULT_PATTERNS,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    chunk_overlap: int = INGEST_CHUNK_OVERLAP,
+    workers: Optional[int] = None,
+    batch_size: int = INGEST_EMBEDDING_BATCH_SIZE,
+    concurrency: int = INGEST_EMBEDDING_CONCURRENCY,
+    index: Optional[IndexSpec] = None,
+    full: bool = False,
+) -> IngestReport:
+    """
+    Ingest the files below `directory` matching `patterns` into the vector
+    store `store_name`, only processing files changed since the last run.
+    The store is rebuilt from scratch with `full`, or when the embedding
+    model, chunking or index settings changed. `index` defaults to the
+    `FAISS_*` environment variables. The saved store is only replaced once
+    the whole run succeeded.
+    """
+    if embedding is None:
+        from langserver.backends import embeddings
+
+        embedding = embeddings()
+    index = index or IndexSpec.from_env()
+
+    started_at = time.perf_counter()
+    path = VECTOR_STORE_DIR / store_name
+    report = IngestReport(store=store_name)
+    settings = {
+        "embedding": embedding_identity(embedding),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "index": asdict(index),
+    }
+
+    manifest = None if full else read_manifest(path)
+    if manifest and any(
+        manifest.get(key) != settings[key] for key in settings
+    ):
+        logger.info(f"Settings of '{store_name}' changed, rebuilding it")
+        manifest = None
+    known: Dict[str, Dict[str, Any]] = manifest["files"] if manifest else {}
+
+    files = scan_directory(directory, patterns)
+    report.files_scanned = len(files)
+    candidates = [
+        source
+        for source, stat in files.items()
+        if source not in known
+        or known[source]["mtime_ns"] != stat.st_mtime_ns
+        or known[source]["size"] != stat.st_size
+    ]
+    removed = [source for source in known if source not in files]
+    report.files_unchanged = len(files) - len(candidates)
+    report.files_removed = len(removed)
+    if not candidates and not removed:
+        report.seconds = round(time.perf_counter() - started_at, 3)
+        return report
+
+    store = load_faiss(path, embedding, mmap=False) if known else None
+    ingestion = _Ingestion(store, embedding, report, batch_size, concurrency)
+    stale_ids = [
+        chunk_id for source in removed for chunk_id in known[source]["ids"]
+    ]
+    entries = {source: known[source] for source in files if source in known}
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(chunk_size, chunk_overlap),
+    ) as pool:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = iter(candidates)
+        in_flight: Dict[asyncio.Future, str] = {}
+
+        def submit() -> None:
+            source = next(pending, None)
+            if source is not None:
+                future = loop.run_in_executor(
+                    pool, _chunk_file, str(directory / source)
+                )
+                in_flight[future] = source
+
+        for _ in range(max_in_flight):
+            submit()
+        while in_flight:
+            done, _ = await asyncio.wait(
+                in_flight, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                source = in_flight.pop(future)
+                file_hash, texts = future.result()
+                submit()
+
+                stat = files[source]
+                previous = known.get(source)
+                if previous and previous["sha256"] == file_hash:
+                    # Touched without changing, keep its chunks
+                    entries[source] = {
+                        **previous,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                    }
+                    report.files_unchanged += 1
+                    continue
+                if previous:
+                    stale_ids.extend(previous["ids"])
+                    report.files_changed += 1
+                else:
+                    report.files_added += 1
+
+                chunks = [
+                    _Chunk(
+                        id=_chunk_id(source, file_hash, index),
+                        text=text,
+                        metadata={"source": source, "chunk": index},
+                    )
+                    for index, text in enumerate(texts)
+                ]
+                entries[source] = {
+                    "sha256": file_hash,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "ids": [chunk.id for chunk in chunks],
+                }
+                await ingestion.add(chunks)
+        await ingestion.finish()
+
+    store = ingestion.store
+    if stale_ids:
+        if isinstance(store.index, faiss.IndexHNSW):
+            # HNSW graphs can't remove vectors, delete from a flat copy
+            convert_index(store, IndexSpec(type="flat"))
+        # One delete, removing ids rebuilds the id mapping of the store
+        store.delete(stale_ids)
+        report.chunks_removed = len(stale_ids)
+    if store is not None and isinstance(store.index, faiss.IndexFlat):
+        # New stores are built flat, IVF needs all vectors for training
+        if index.type != "flat":
+            convert_index(store, index)
+    if store is not None:
+        save_faiss(
+            store, path, {MANIFEST_FILE: {**settings, "files": entries}}
+        )
+
+    report.seconds = round(time.perf_counter() - started_at, 3)
+    logger.info(f"Ingested '{directory}' into '{store_name}': {report}")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Ingest a directory of text files into a vector store."
+    )
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--store", required=True, help="Vector store name")
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        dest="patterns",
+        help=f"File name pattern, repeatable (default: {DEFAULT_PATTERNS})",
+    )
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument(
+        "--chunk-overlap", type=int, default=INGEST_CHUNK_OVERLAP
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Chunking processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=INGEST_EMBEDDING_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=INGEST_EMBEDDING_CONCURRENCY
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=INDEX_TYPES,
+        help="FAISS index type (default: FAISS_INDEX_TYPE or flat)",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Rebuild instead of updating"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        ingest_directory(
+            args.directory,
+            args.store,
+            patterns=args.patterns or DEFAULT_PATTERNS,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            index=IndexSpec.from_env(args.index_type),
+            full=args.full,
+        )
+    )
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,654 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    get_buffer_string,
+    messages_to_dict,
+)
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+from langchain_core.runnables import (
+    Runnable,
+    RunnableBinding,
+    RunnableConfig,
+    RunnableSerializable,
+)
+from langchain_core.runnables.config import ensure_config
+from langchain_core.runnables.configurable import DynamicRunnable
+from langchain_core.runnables.utils import ConfigurableFieldSpec
+from pydantic import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by all chains and LangServe workers
+LLM_CACHE_PATH = Path(
+    os.getenv(
+        "LLM_CACHE_PATH", Path(__file__).resolve().parent / ".llm_cache.sqlite"
+    )
+)
+# Responses older than this are misses, 0 keeps them until evicted
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+# Least recently used responses are evicted beyond this
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+# Cosine similarity of prompts for a semantic cache hit
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.95"))
+
+LLM_CACHE_MODES = ("off", "exact", "semantic")
+
+# Stats of runs without a `session_id` in their metadata
+DEFAULT_SESSION = "default"
+
+LLM_CACHE_SPEC = ConfigurableFieldSpec(
+    id="llm_cache",
+    annotation=Literal["off", "exact", "semantic"],
+    name="LLM Cache",
+    description=(
+        "Reuse model responses for the same prompt (exact) or a similar "
+        "prompt (semantic) with the same model parameters"
+    ),
+    default="off",
+)
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+@dataclass
+class HitStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        calls = self.hits + self.misses
+        return round(self.hits / calls, 4) if calls else None
+
+
+class CacheStats:
+    """Hits and misses of the LLM caches by session and cache mode."""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], HitStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, session: str, mode: str, hit: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault((session, mode), HitStats())
+            if hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+    def report(
+        self, session: Optional[str] = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Hits, misses and hit rate by session and mode."""
+        report: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (stats_session, mode), stats in sorted(self._stats.items()):
+                if session is not None and stats_session != session:
+                    continue
+                report.setdefault(stats_session, {})[mode] = {
+                    "hits": stats.hits,
+                    "misses": stats.misses,
+                    "hit_rate": stats.hit_rate,
+                }
+        return report
+
+
+class ResponseStore:
+    """
+    Model responses by prompt and model parameters in a SQLite file, with
+    the prompt embedding of responses cached in semantic mode. Responses
+    expire after `ttl_seconds`, and the least recently used are evicted
+    beyond `max_entries`. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Deletes through this connection, see `version`
+        self._deletes = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "llm_key TEXT NOT NULL, "
+            "message TEXT NOT NULL, "
+            "vector BLOB, "
+            "created_at REAL NOT NULL, "
+            "last_accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_responses_llm_key "
+            "ON responses (llm_key)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_responses_last_accessed "
+            "ON responses (last_accessed)"
+        )
+
+    def version(self) -> Tuple[int, int]:
+        """
+        Changes when responses were deleted here or written by another
+        connection, e.g. another worker, so semantic indexes of the stored
+        prompts know to load again.
+        """
+        with self._lock:
+            (data_version,) = self._db.execute(
+                "PRAGMA data_version"
+            ).fetchone()
+            return self._deletes, data_version
+
+    def _fresh_since(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        """Look up a fresh response and mark it as recently used."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT message FROM responses "
+                "WHERE key = ? AND created_at >= ?",
+                (key, self._fresh_since()),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_accessed = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return AIMessage(**json.loads(row[0]))
+
+    def vectors(self, llm_key: str) -> Tuple[List[str], np.ndarray]:
+        """Keys and prompt embeddings of fresh responses."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, vector FROM responses "
+                "WHERE llm_key = ? AND vector IS NOT NULL "
+                "AND created_at >= ?",
+                (llm_key, self._fresh_since()),
+            ).fetchall()
+        if not rows:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return [key for key, _ in rows], np.stack(
+            [np.frombuffer(vector, dtype=np.float32) for _, vector in rows]
+        )
+
+    def put(
+        self,
+        key: str,
+        llm_key: str,
+        message: BaseMessage,
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        """Store a response and evict expired and surplus responses."""
+        now = time.time()
+        dumped = json.dumps(
+            {
+                "content": message.content,
+                "additional_kwargs": message.additional_kwargs,
+                "response_metadata": message.response_metadata,
+            },
+            default=str,
+        )
+        blob = None if vector is None else vector.astype(np.float32).tobytes()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, llm_key, message, vector, created_at, "
+                    "last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, llm_key, dumped, blob, now, now),
+                )
+                self._evict()
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        deleted = self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?",
+            (self._fresh_since(),),
+        ).rowcount
+        deleted += self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses "
+            "ORDER BY last_accessed DESC, key LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        if deleted:
+            self._deletes += 1
+            logger.info(f"Evicted {deleted} LLM cache entries")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._deletes += 1
+
+
+@dataclass
+class Prompt:
+    """A model call as seen by the caches."""
+
+    messages: str  # Serialized messages
+    text: str  # Text of the messages, embedded in semantic mode
+    llm_string: str  # Model class and parameters
+
+    @property
+    def key(self) -> str:
+        return _hash(self.llm_string, self.messages)
+
+    @property
+    def llm_key(self) -> str:
+        return _hash(self.llm_string)
+
+
+class ExactLLMCache:
+    """Reuses the response to the same prompt and model parameters."""
+
+    def __init__(self, store: ResponseStore):
+        self.store = store
+
+    def _get(self, key: str) -> Optional[AIMessage]:
+        try:
+            return self.store.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read LLM cache: {e}")
+            return None
+
+    def _put(
+        self,
+        prompt: Prompt,
+        message: BaseMessage,
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        try:
+            self.store.put(prompt.key, prompt.llm_key, message, vector)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write LLM cache: {e}")
+
+    def lookup(self, prompt: Prompt) -> Optional[AIMessage]:
+        return self._get(prompt.key)
+
+    async def alookup(self, prompt: Prompt) -> Optional[AIMessage]:
+        return await asyncio.to_thread(self._get, prompt.key)
+
+    def update(self, prompt: Prompt, message: BaseMessage) -> None:
+        self._put(prompt, message)
+
+    async def aupdate(self, prompt: Prompt, message: BaseMessage) -> None:
+        await asyncio.to_thread(self._put, prompt, message)
+
+
+class SemanticLLMCache(ExactLLMCache):
+    """
+    Also reuses the response to the most similar earlier prompt with the
+    same model parameters, if the cosine similarity of their embeddings is
+    at least `threshold`. Prompt embeddings are searched in memory.
+    """
+
+    def __init__(
+        self, store: ResponseStore, embedding: Embeddings, threshold: float
+    ):
+        super().__init__(store)
+        self.embedding = embedding
+        self.threshold = threshold
+        # Store version, keys and embedding matrix by model parameters
+        self._indexes: Dict[
+            str, Tuple[Tuple[int, int], List[str], np.ndarray]
+        ] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _index(self, llm_key: str) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            version = self.store.version()
+            index = self._indexes.get(llm_key)
+            if index is None or index[0] != version:
+                index = (version, *self.store.vectors(llm_key))
+                self._indexes[llm_key] = index
+            return index[1], index[2]
+
+    def _nearest(
+        self, prompt: Prompt, vector: np.ndarray
+    ) -> Optional[AIMessage]:
+        try:
+            keys, matrix = self._index(prompt.llm_key)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read LLM cache: {e}")
+            return None
+        if not keys or matrix.shape[1] != vector.shape[0]:
+            return None
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._get(keys[best])
+
+    def _add(self, prompt: Prompt, message: BaseMessage, vector: np.ndarray):
+        self._put(prompt, message, vector)
+        with self._lock:
+            index = self._indexes.get(prompt.llm_key)
+            try:
+                if index is None or index[0] != self.store.version():
+                    return
+            except sqlite3.Error:
+                return
+            version, keys, matrix = index
+            if keys and matrix.shape[1] != vector.shape[0]:
+                return
+            self._indexes[prompt.llm_key] = (
+                version,
+                keys + [prompt.key],
+                np.vstack([matrix.reshape(-1, len(vector)), vector]),
+            )
+
+    def lookup(self, prompt: Prompt) -> Optional[AIMessage]:
+        # Identical prompts are found without embedding them
+        message = self._get(prompt.key)
+        if message is None:
+            vector = self._normalize(self.embedding.embed_query(prompt.text))
+            message = self._nearest(prompt, vector)
+        return message
+
+    async def alookup(self, prompt: Prompt) -> Optional[AIMessage]:
+        message = await asyncio.to_thread(self._get, prompt.key)
+        if message is None:
+            vector = self._normalize(
+                await self.embedding.aembed_query(prompt.text)
+            )
+            message = await asyncio.to_thread(self._nearest, prompt, vector)
+        return message
+
+    # The lookup before embedded the prompt, so the embedding cache has it
+    def update(self, prompt: Prompt, message: BaseMessage) -> None:
+        vector = self._normalize(self.embedding.embed_query(prompt.text))
+        self._add(prompt, message, vector)
+
+    async def aupdate(self, prompt: Prompt, message: BaseMessage) -> None:
+        vector = self._normalize(
+            await self.embedding.aembed_query(prompt.text)
+        )
+        await asyncio.to_thread(self._add, prompt, message, vector)
+
+
+llm_cache_stats = CacheStats()
+
+_caches: Optional[Dict[str, ExactLLMCache]] = None
+_caches_lock = threading.Lock()
+
+
+def shared_llm_caches() -> Dict[str, ExactLLMCache]:
+    """The caches at `LLM_CACHE_PATH` by mode, opened once per process."""
+    global _caches
+    with _caches_lock:
+        if _caches is None:
+            from langserver.backends import embeddings
+
+            store = ResponseStore(
+                LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES
+            )
+            _caches = {
+                "exact": ExactLLMCache(store),
+                "semantic": SemanticLLMCache(
+                    store, embeddings(), LLM_CACHE_SIMILARITY
+                ),
+            }
+        return _caches
+
+
+class CachedResponseModel(BaseChatModel):
+    """
+    Chat model answering with a cached response, so a cache hit reports to
+    callbacks and streams like a model call, using no tokens.
+    """
+
+    message: AIMessage
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-cache"
+
+    def _response(self) -> AIMessage:
+        return self.message.model_copy(
+            update={
+                "usage_metadata": {
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                    "total_tokens": 0,
+                }
+            }
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(
+            generations=[ChatGeneration(message=self._response())]
+        )
+
+    def _chunk(self) -> ChatGenerationChunk:
+        response = self._response()
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=response.content,
+                additional_kwargs=response.additional_kwargs,
+                response_metadata=response.response_metadata,
+                usage_metadata=response.usage_metadata,
+            )
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunk = self._chunk()
+        if run_manager:
+            run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+        yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunk = self._chunk()
+        if run_manager:
+            await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+        yield chunk
+
+
+class LLMCachedModel(RunnableSerializable):
+    """
+    Chat model, configurable or not, whose responses are cached when the
+    `llm_cache` configurable is `exact` or `semantic`. Hits and misses are
+    counted for the `session_id` in the run metadata.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    bound: Runnable
+
+    @property
+    def InputType(self) -> Any:
+        return self.bound.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.bound.OutputType
+
+    @property
+    def config_specs(self) -> List[ConfigurableFieldSpec]:
+        return [*self.bound.config_specs, LLM_CACHE_SPEC]
+
+    def _cache(
+        self, input: Any, config: RunnableConfig, kwargs: Dict[str, Any]
+    ) -> Tuple[Optional[ExactLLMCache], Optional[Prompt], str]:
+        mode = config.get("configurable", {}).get("llm_cache") or "off"
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(
+                f"Unknown LLM cache mode '{mode}', "
+                f"expected one of {', '.join(LLM_CACHE_MODES)}"
+            )
+        if mode == "off":
+            return None, None, mode
+        # Call kwargs, e.g. `stop`, bound to the model or passed with the call
+        model, call_kwargs = self.bound, dict(kwargs)
+        while isinstance(model, (DynamicRunnable, RunnableBinding)):
+            if isinstance(model, DynamicRunnable):
+                model, _ = model.prepare(config)
+            else:
+                call_kwargs = {**model.kwargs, **call_kwargs}
+                model = model.bound
+        if not isinstance(model, BaseChatModel):
+            return None, None, mode
+
+        messages = model._convert_input(input).to_messages()
+        prompt = Prompt(
+            messages=json.dumps(messages_to_dict(messages), sort_keys=True),
+            text=get_buffer_string(messages),
+            # LangChain's own cache key of the model class, parameters and
+            # call kwargs
+            llm_string=model._get_llm_string(**call_kwargs),
+        )
+        return shared_llm_caches()[mode], prompt, mode
+
+    def _record(self, config: RunnableConfig, mode: str, hit: bool) -> None:
+        session = (config.get("metadata") or {}).get("session_id")
+        llm_cache_stats.record(str(session or DEFAULT_SESSION), mode, hit)
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> BaseMessage:
+        config = ensure_config(config)
+        cache, prompt, mode = self._cache(input, config, kwargs)
+        if cache is None:
+            return self.bound.invoke(input, config, **kwargs)
+        cached = cache.lookup(prompt)
+        self._record(config, mode, cached is not None)
+        if cached is not None:
+            return CachedResponseModel(message=cached).invoke(input, config)
+        output = self.bound.invoke(input, config, **kwargs)
+        cache.update(prompt, output)
+        return output
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> BaseMessage:
+        config = ensure_config(config)
+        cache, prompt, mode = self._cache(input, config, kwargs)
+        if cache is None:
+            return await self.bound.ainvoke(input, config, **kwargs)
+        cached = await cache.alookup(prompt)
+        self._record(config, mode, cached is not None)
+        if cached is not None:
+            return await CachedResponseModel(message=cached).ainvoke(
+                input, config
+            )
+        output = await self.bound.ainvoke(input, config, **kwargs)
+        await cache.aupdate(prompt, output)
+        return output
+
+    def stream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> Iterator[BaseMessage]:
+        config = ensure_config(config)
+        cache, prompt, mode = self._cache(input, config, kwargs)
+        if cache is None:
+            yield from self.bound.stream(input, config, **kwargs)
+            return
+        cached = cache.lookup(prompt)
+        self._record(config, mode, cached is not None)
+        if cached is not None:
+            yield from CachedResponseModel(message=cached).stream(
+                input, config
+            )
+            return
+        output = None
+        for chunk in self.bound.stream(input, config, **kwargs):
+            output = chunk if output is None else output + chunk
+            yield chunk
+        if output is not None:
+            cache.update(prompt, output)
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> AsyncIterator[BaseMessage]:
+        config = ensure_config(config)
+        cache, prompt, mode = self._cache(input, config, kwargs)
+        if cache is None:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
+            return
+        cached = await cache.alookup(prompt)
+        self._record(config, mode, cached is not None)
+        if cached is not None:
+            model = CachedResponseModel(message=cached)
+            async for chunk in model.astream(input, config):
+                yield chunk
+            return
+        output = None
+        async for chunk in self.bound.astream(input, config, **kwargs):
+            output = chunk if output is None else output + chunk
+            yield chunk
+        if output is not None:
+            await cache.aupdate(prompt, output)
+
+
+def with_llm_cache(model: Runnable) -> Runnable:
+    """Let a chat model cache its responses through `llm_cache`."""
+    return LLMCachedModel(bound=model)
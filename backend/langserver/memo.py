@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain_core.runnables import (
+    Runnable,
+    RunnableConfig,
+    RunnableSerializable,
+)
+from langchain_core.runnables.config import ensure_config, patch_config
+from langchain_core.runnables.utils import ConfigurableFieldSpec
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+
+# Stage outputs kept across all chains, 0 turns memoization off
+STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "10000"))
+# Run metadata flag of runs that must not reuse or store stage outputs,
+# e.g. invocations of the main app with `use_cache` disabled
+BYPASS_METADATA_KEY = "bypass_stage_cache"
+
+
+@dataclass
+class StageStats:
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        calls = self.hits + self.misses
+        return round(self.hits / calls, 4) if calls else None
+
+
+class StageCache:
+    """Outputs of memoized stages, evicted least recently used."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, stage: str, key: str) -> Tuple[bool, Any]:
+        """Look up an output and count the call as a hit or miss."""
+        with self._lock:
+            stats = self._stats.setdefault(stage, StageStats())
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                stats.hits += 1
+                return True, self._entries[key][1]
+            stats.misses += 1
+            return False, None
+
+    def count_hit(self, stage: str) -> None:
+        """Count a call served by a concurrent identical call as a hit."""
+        with self._lock:
+            stats = self._stats.setdefault(stage, StageStats())
+            stats.hits += 1
+            stats.misses -= 1
+
+    def put(self, stage: str, key: str, output: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if key not in self._entries:
+                self._stats.setdefault(stage, StageStats()).entries += 1
+            self._entries[key] = (stage, output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_stage, _ = self._entries.popitem(last=False)[1]
+                self._stats[evicted_stage].entries -= 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hits, misses, hit rate and cached entries by stage name."""
+        with self._lock:
+            return {
+                stage: {**asdict(stats), "hit_rate": stats.hit_rate}
+                for stage, stats in sorted(self._stats.items())
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+
+stage_cache = StageCache(STAGE_CACHE_MAX_ENTRIES)
+
+
+class MemoizedRunnable(RunnableSerializable):
+    """
+    Chain stage whose outputs are reused for the same input and the same
+    values of the configurable fields the stage has, e.g. the retrieval of
+    configurations that only differ in generation settings. Concurrent
+    identical async calls share one run of the stage. Runs with
+    `BYPASS_METADATA_KEY` set in their metadata always run the stage.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    bound: Runnable
+    stage: str
+
+    # Keys of this instance only, so a reloaded chain starts afresh
+    _namespace: str = PrivateAttr(default_factory=lambda: uuid.uuid4().hex)
+    # Calls in flight by event loop and key. Chains run in process are
+    # shared by the loops of the main app and LangServe, and a future can
+    # only be awaited on the loop it belongs to
+    _flights: Dict[Tuple[int, str], asyncio.Future] = PrivateAttr(
+        default_factory=dict
+    )
+    _flights_lock: threading.Lock = PrivateAttr(
+        default_factory=threading.Lock
+    )
+
+    @property
+    def InputType(self) -> Any:
+        return self.bound.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.bound.OutputType
+
+    def get_input_schema(
+        self, config: Optional[RunnableConfig] = None
+    ) -> Type[BaseModel]:
+        return self.bound.get_input_schema(config)
+
+    def get_output_schema(
+        self, config: Optional[RunnableConfig] = None
+    ) -> Type[BaseModel]:
+        return self.bound.get_output_schema(config)
+
+    @property
+    def config_specs(self) -> List[ConfigurableFieldSpec]:
+        return self.bound.config_specs
+
+    def _key(self, input: Any, config: RunnableConfig) -> str:
+        configurable = config.get("configurable", {})
+        fields = {
+            spec.id: configurable.get(spec.id)
+            for spec in self.bound.config_specs
+        }
+        canonical = json.dumps(
+            [self._namespace, input, fields], sort_keys=True, default=repr
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def _bypassed(config: RunnableConfig) -> bool:
+        return bool((config.get("metadata") or {}).get(BYPASS_METADATA_KEY))
+
+    def _invoke(
+        self,
+        input: Any,
+        run_manager: CallbackManagerForChainRun,
+        config: RunnableConfig,
+    ) -> Any:
+        if self._bypassed(config):
+            return self.bound.invoke(
+                input, patch_config(config, callbacks=run_manager.get_child())
+            )
+        key = self._key(input, config)
+        found, output = stage_cache.get(self.stage, key)
+        if found:
+            return output
+        output = self.bound.invoke(
+            input, patch_config(config, callbacks=run_manager.get_child())
+        )
+        stage_cache.put(self.stage, key, output)
+        return output
+
+    async def _ainvoke(
+        self,
+        input: Any,
+        run_manager: AsyncCallbackManagerForChainRun,
+        config: RunnableConfig,
+    ) -> Any:
+        if self._bypassed(config):
+            return await self.bound.ainvoke(
+                input, patch_config(config, callbacks=run_manager.get_child())
+            )
+        key = self._key(input, config)
+        found, output = stage_cache.get(self.stage, key)
+        if found:
+            return output
+
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        while True:
+            with self._flights_lock:
+                flight = self._flights.get(flight_key)
+                if flight is None:
+                    flight = self._flights[flight_key] = loop.create_future()
+                    break
+            try:
+                output = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # The leading call was cancelled, not this one: run it here
+                if (
+                    asyncio.current_task().cancelling()
+                    or not flight.cancelled()
+                ):
+                    raise
+                continue
+            stage_cache.count_hit(self.stage)
+            return output
+
+        try:
+            output = await self.bound.ainvoke(
+                input, patch_config(config, callbacks=run_manager.get_child())
+            )
+        except BaseException:
+            flight.cancel()
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[flight_key]
+        stage_cache.put(self.stage, key, output)
+        flight.set_result(output)
+        return output
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> Any:
+        return self._call_with_config(
+            self._invoke, input, ensure_config(config)
+        )
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> Any:
+        return await self._acall_with_config(
+            self._ainvoke, input, ensure_config(config)
+        )
+
+
+def memoize(runnable: Runnable, stage: str) -> Runnable:
+    """Memoize a chain stage, reported as `stage` in the cache stats."""
+    if STAGE_CACHE_MAX_ENTRIES <= 0:
+        return runnable
+    return MemoizedRunnable(bound=runnable, stage=stage, name=stage)
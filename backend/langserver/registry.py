@@ -0,0 +1,203 @@
+import hashlib
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+# Chain modules in this directory are the single source of truth for both
+# the LangServe app and in-process execution in the main app
+CHAINS_DIR = Path(__file__).resolve().parent / "chains"
+CHAINS_PACKAGE = f"{__package__}.chains"
+
+# Module attributes holding the runnable to serve, in order of preference
+RUNNABLE_ATTRIBUTES = ("chain", "rag_chain")
+
+# Seconds the chain list is reused before the directory is checked again
+CHAIN_REGISTRY_POLL_INTERVAL = float(
+    os.getenv("CHAIN_REGISTRY_POLL_INTERVAL", "1")
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ChainFile:
+    """A chain module on disk and the hash of its code."""
+
+    name: str
+    path: Path
+    mtime_ns: int
+    size: int
+    content_hash: str
+
+    @property
+    def file_name(self) -> str:
+        return self.path.name
+
+
+@dataclass
+class ChainStatus:
+    """Load state of a chain module."""
+
+    name: str
+    status: str = "not_loaded"  # not_loaded, loading, loaded or failed
+    load_time_ms: Optional[int] = None
+    error: Optional[str] = None
+    content_hash: Optional[str] = None  # Version loaded or tried to load
+
+
+_files: Dict[str, ChainFile] = {}
+_checked_at: Optional[float] = None
+_files_lock = threading.Lock()
+
+_chains: Dict[str, Tuple[str, "Runnable"]] = {}
+_statuses: Dict[str, ChainStatus] = {}
+# One lock per chain, so a slow chain doesn't hold up loading the others
+_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def _hash_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _refresh() -> None:
+    """Pick up new, changed and removed chain files by their mtime."""
+    global _files, _checked_at
+    files: Dict[str, ChainFile] = {}
+    for entry in os.scandir(CHAINS_DIR):
+        if not entry.name.endswith(".py") or not entry.is_file():
+            continue
+        name = entry.name[:-3]
+        stat = entry.stat()
+        known = _files.get(name)
+        if (
+            known
+            and known.mtime_ns == stat.st_mtime_ns
+            and known.size == stat.st_size
+        ):
+            files[name] = known
+            continue
+        files[name] = ChainFile(
+            name=name,
+            path=Path(entry.path),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            content_hash=_hash_file(Path(entry.path)),
+        )
+        if known is None:
+            logger.info(f"Found chain file: {entry.name}")
+        elif known.content_hash != files[name].content_hash:
+            logger.info(f"Chain file changed: {entry.name}")
+
+    for name in _files.keys() - files.keys():
+        logger.info(f"Chain file removed: {name}.py")
+    _files = files
+    _checked_at = time.monotonic()
+
+
+def list_chains() -> List[ChainFile]:
+    """
+    All chain modules, sorted by name. The directory is checked again at
+    most every `CHAIN_REGISTRY_POLL_INTERVAL` seconds, and only changed
+    files are hashed again.
+    """
+    with _files_lock:
+        if (
+            _checked_at is None
+            or time.monotonic() - _checked_at >= CHAIN_REGISTRY_POLL_INTERVAL
+        ):
+            _refresh()
+        return sorted(_files.values(), key=lambda file: file.name)
+
+
+def list_chain_names() -> List[str]:
+    """Names of all chain modules, i.e. their file names without `.py`."""
+    return [file.name for file in list_chains()]
+
+
+def get_chain_file(name: str) -> Optional[ChainFile]:
+    """The chain module `name`, if there is one."""
+    return next((file for file in list_chains() if file.name == name), None)
+
+
+def load_chain(name: str) -> "Runnable":
+    """
+    Import a chain module and return its runnable. The module is imported
+    again when its code changed since it was loaded.
+    """
+    chain_file = get_chain_file(name)
+    if chain_file is None:
+        raise KeyError(f"Chain '{name}' not found in {CHAINS_DIR}")
+    loaded = _chains.get(name)
+    if loaded and loaded[0] == chain_file.content_hash:
+        return loaded[1]
+
+    with _locks_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        loaded = _chains.get(name)
+        if not loaded or loaded[0] != chain_file.content_hash:
+            runnable = _import_chain(chain_file)
+            _chains[name] = (chain_file.content_hash, runnable)
+    return _chains[name][1]
+
+
+def _import_chain(chain_file: ChainFile) -> "Runnable":
+    from langchain_core.runnables import Runnable
+
+    name = chain_file.name
+    status = _statuses[name] = ChainStatus(
+        name=name, status="loading", content_hash=chain_file.content_hash
+    )
+    started_at = time.perf_counter()
+    try:
+        # Find modules added since the last import
+        importlib.invalidate_caches()
+        module_name = f"{CHAINS_PACKAGE}.{name}"
+        if module_name in sys.modules:
+            module = importlib.reload(sys.modules[module_name])
+        else:
+            module = importlib.import_module(module_name)
+        for attribute in RUNNABLE_ATTRIBUTES:
+            runnable = getattr(module, attribute, None)
+            if isinstance(runnable, Runnable):
+                break
+        else:
+            raise KeyError(
+                f"Chain module '{name}' defines none of "
+                f"{', '.join(RUNNABLE_ATTRIBUTES)}"
+            )
+    except Exception as e:
+        status.status, status.error = "failed", str(e)
+        logger.error(f"Failed to load chain '{name}': {e}")
+        raise
+    finally:
+        status.load_time_ms = round((time.perf_counter() - started_at) * 1000)
+
+    status.status = "loaded"
+    logger.info(f"Loaded chain '{name}' in {status.load_time_ms} ms")
+    return runnable
+
+
+def loaded_version(name: str) -> Optional[str]:
+    """Content hash of the loaded version of a chain, if it was loaded."""
+    loaded = _chains.get(name)
+    return loaded[0] if loaded else None
+
+
+def chain_statuses() -> List[ChainStatus]:
+    """Load state of every chain module, including ones not loaded yet."""
+    return [
+        _statuses.get(file.name)
+        or ChainStatus(name=file.name, content_hash=file.content_hash)
+        for file in list_chains()
+    ]
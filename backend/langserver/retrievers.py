@@ -0,0 +1,198 @@
+import asyncio
+import re
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field
+
+# Documents returned when `search_kwargs` has no `k`, like vector stores
+DEFAULT_K = 4
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of texts. The inverted index holds the
+    BM25 weight of every (term, document) pair, precomputed at build time,
+    so scoring a query is summing the postings of its terms with numpy.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(texts)
+        self.vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        frequencies: List[int] = []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, frequency in counts.items():
+                term_ids.append(
+                    self.vocabulary.setdefault(term, len(self.vocabulary))
+                )
+                doc_ids.append(doc_id)
+                frequencies.append(frequency)
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        terms = terms[order]
+        docs = np.asarray(doc_ids, dtype=np.int64)[order]
+        tf = np.asarray(frequencies, dtype=np.float32)[order]
+
+        # Postings of term t are docs[indptr[t]:indptr[t + 1]]
+        df = np.bincount(terms, minlength=len(self.vocabulary))
+        self.indptr = np.concatenate(([0], np.cumsum(df)))
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+        average_length = lengths.mean() if self.size else 0.0
+        norm = k1 * (1 - b + b * lengths[docs] / max(average_length, 1e-9))
+        self.doc_ids = docs
+        self.weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for `query`."""
+        postings = [
+            slice(self.indptr[term], self.indptr[term + 1])
+            for term in (self.vocabulary.get(t) for t in tokenize(query))
+            if term is not None
+        ]
+        if not postings:
+            return np.zeros(self.size, dtype=np.float32)
+        return np.bincount(
+            np.concatenate([self.doc_ids[p] for p in postings]),
+            weights=np.concatenate([self.weights[p] for p in postings]),
+            minlength=self.size,
+        )
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Positions and scores of the `k` best matching documents."""
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class BM25Retriever(BaseRetriever):
+    """
+    Lexical retriever ranking documents by BM25, without an embedding call
+    at query time. `search_kwargs` takes `k` like vector store retrievers.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: BM25Index
+    documents: List[Document]
+    # Annotated like `VectorStoreRetriever`, so their configurable fields match
+    search_kwargs: dict = Field(default_factory=dict)
+
+    @classmethod
+    def from_documents(
+        cls, documents: Sequence[Document], **kwargs: Any
+    ) -> "BM25Retriever":
+        documents = list(documents)
+        index = BM25Index([document.page_content for document in documents])
+        return cls(index=index, documents=documents, **kwargs)
+
+    @classmethod
+    def from_store(cls, store: FAISS, **kwargs: Any) -> "BM25Retriever":
+        """Index the documents of a FAISS store."""
+        documents = [
+            store.docstore.search(store.index_to_docstore_id[position])
+            for position in range(len(store.index_to_docstore_id))
+        ]
+        return cls.from_documents(
+            [d for d in documents if isinstance(d, Document)], **kwargs
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        k = self.search_kwargs.get("k", DEFAULT_K)
+        return [
+            self.documents[position]
+            for position, _ in self.index.search(query, k)
+        ]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Document]], k: int, rrf_k: int = 60
+) -> List[Document]:
+    """
+    Fuse rankings by summing 1 / (rrf_k + rank) per document. Documents
+    with the same content count as one, as vector stores don't return ids.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document.page_content
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses the rankings of a dense and a BM25 retriever with reciprocal rank
+    fusion. Both fetch `fetch_k` candidates, `search_kwargs` takes the `k`
+    fused documents to return.
+    """
+
+    dense: BaseRetriever
+    sparse: BM25Retriever
+    # Annotated like `VectorStoreRetriever`, so their configurable fields match
+    search_kwargs: dict = Field(default_factory=dict)
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _candidates(self) -> Tuple[BaseRetriever, BaseRetriever, int]:
+        k = self.search_kwargs.get("k", DEFAULT_K)
+        fetch_k = max(self.fetch_k, k)
+        dense = self.dense
+        if hasattr(dense, "search_kwargs"):
+            dense = dense.model_copy(
+                update={"search_kwargs": {**dense.search_kwargs, "k": fetch_k}}
+            )
+        sparse = self.sparse.model_copy(
+            update={"search_kwargs": {"k": fetch_k}}
+        )
+        return dense, sparse, k
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense, sparse, k = self._candidates()
+        config = {"callbacks": run_manager.get_child()}
+        rankings = [
+            dense.invoke(query, config=config),
+            sparse.invoke(query, config=config),
+        ]
+        return reciprocal_rank_fusion(rankings, k, self.rrf_k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense, sparse, k = self._candidates()
+        config = {"callbacks": run_manager.get_child()}
+        rankings = await asyncio.gather(
+            dense.ainvoke(query, config=config),
+            sparse.ainvoke(query, config=config),
+        )
+        return reciprocal_rank_fusion(rankings, k, self.rrf_k)
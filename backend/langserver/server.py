@@ -1,13 +1,209 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .chains.simple_chain import rag_chain as simple_rag_chain
-from .chains.complex_configurable_chain import rag_chain
-from .chains.experimental_chain import chain
+from langchain_core.runnables import Runnable
 from langserve import add_routes
+from langserve.serialization import WellKnownLCSerializer
+from pydantic import BaseModel, Field
+from starlette.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from .callbacks import RunMetricsHandler
+from .llm_cache import llm_cache_stats
+from .memo import stage_cache
+from .registry import (
+    chain_statuses,
+    get_chain_file,
+    list_chain_names,
+    load_chain,
+)
+
+logger = logging.getLogger(__name__)
+
+# Config keys requests may set, metadata carries the `session_id` of the LLM
+# cache stats and the stage cache bypass
+CONFIG_KEYS = ("configurable", "metadata")
+
+
+class MeasuredBatchRequest(BaseModel):
+    """Body of the measured batch endpoint, like LangServe's batch body."""
+
+    inputs: List[Any]
+    config: Dict[str, Any] = Field(default_factory=dict)
+    kwargs: Dict[str, Any] = Field(default_factory=dict)
+
+
+def chain_error_response(error: Exception) -> JSONResponse:
+    """
+    Response to an exception raised by a chain, with the status code the
+    main app classifies failures by: 429 for rate limits, 422 for rejected
+    inputs, 502 for unreachable providers and 500 otherwise.
+    """
+    name = type(error).__name__
+    status_code = getattr(error, "status_code", None)
+    headers = {}
+    if status_code == 429 or "RateLimit" in name:
+        status_code = 429
+        response = getattr(error, "response", None)
+        retry_after = (getattr(response, "headers", None) or {}).get(
+            "retry-after"
+        )
+        if retry_after:
+            headers["Retry-After"] = retry_after
+    elif status_code in (400, 413, 422) or isinstance(
+        error, (ValueError, TypeError)
+    ):
+        status_code = 422
+    elif isinstance(error, (ConnectionError, asyncio.TimeoutError)):
+        status_code = 502
+    else:
+        status_code = 500
+    return JSONResponse(
+        {"detail": f"{name}: {error}"},
+        status_code=status_code,
+        headers=headers,
+    )
+
+
+def add_measured_batch_route(
+    app: FastAPI, runnable: Runnable, path: str
+) -> None:
+    """
+    Add `{path}/measured_batch`, which runs a batch like LangServe's batch
+    endpoint and returns the metrics of every run next to its output: wall
+    time, time to the first token, token usage and model name.
+    """
+    serializer = WellKnownLCSerializer()
+
+    @app.post(f"{path}/measured_batch")
+    async def measured_batch(request: MeasuredBatchRequest) -> JSONResponse:
+        config = {
+            key: value
+            for key, value in request.config.items()
+            if key in CONFIG_KEYS and value is not None
+        }
+        handlers = [RunMetricsHandler() for _ in request.inputs]
+        try:
+            outputs = await runnable.abatch(
+                request.inputs,
+                config=[
+                    {**config, "callbacks": [handler]} for handler in handlers
+                ],
+            )
+        except Exception as e:
+            logger.warning(f"Measured batch of '{path}' failed: {e}")
+            return chain_error_response(e)
+        return JSONResponse(
+            {
+                "output": serializer.dumpd(outputs),
+                "metrics": [handler.metrics() for handler in handlers],
+            }
+        )
+
+
+class LazyChainRoutes:
+    """
+    ASGI app serving every chain module under its file name, e.g.
+    `/simple_chain`. A chain is imported and gets its LangServe routes on
+    its first request, so startup doesn't wait for any chain and a broken
+    chain only fails its own routes. New chain files are served without a
+    restart, and changed ones are loaded again on their next request.
+    """
+
+    def __init__(self):
+        # Content hash of the served chain version and its app, by name
+        self._apps: Dict[str, Tuple[str, FastAPI]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get_app(self, name: str) -> FastAPI:
+        """The app with the LangServe routes of a chain's current version."""
+        chain_file = get_chain_file(name)
+        if chain_file is None:
+            raise KeyError(f"Chain '{name}' not found")
+        served = self._apps.get(name)
+        if served and served[0] == chain_file.content_hash:
+            return served[1]
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            served = self._apps.get(name)
+            if not served or served[0] != chain_file.content_hash:
+                # Chain modules build their vector stores at import time
+                runnable = await asyncio.to_thread(load_chain, name)
+                chain_app = FastAPI()
+                add_routes(
+                    chain_app,
+                    runnable,
+                    path=f"/{name}",
+                    config_keys=CONFIG_KEYS,
+                )
+                add_measured_batch_route(chain_app, runnable, f"/{name}")
+                self._apps[name] = (chain_file.content_hash, chain_app)
+        return self._apps[name][1]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        name = path.lstrip("/").split("/", 1)[0]
+
+        if name not in list_chain_names():
+            response = JSONResponse({"detail": "Not Found"}, status_code=404)
+            return await response(scope, receive, send)
+        try:
+            chain_app = await self.get_app(name)
+        except Exception as e:
+            response = JSONResponse(
+                {"detail": f"Chain '{name}' failed to load: {e}"},
+                status_code=503,
+            )
+            return await response(scope, receive, send)
+        await chain_app(scope, receive, send)
+
+    async def warm_up(self, names: List[str]) -> None:
+        """Load chains ahead of their first request, logging failures."""
+        results = await asyncio.gather(
+            *(self.get_app(name) for name in names), return_exceptions=True
+        )
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm-up of chain '{name}' failed: {result}")
+
+
+def warm_up_chain_names() -> List[str]:
+    """Chains named in `LANGSERVE_WARMUP`, a comma separated list or `all`."""
+    setting = os.getenv("LANGSERVE_WARMUP", "").strip()
+    if setting == "all":
+        return list_chain_names()
+    names = [name.strip() for name in setting.split(",") if name.strip()]
+    unknown = set(names) - set(list_chain_names())
+    if unknown:
+        logger.warning(f"Can't warm up unknown chains: {', '.join(unknown)}")
+    return [name for name in names if name not in unknown]
+
+
+chain_routes = LazyChainRoutes()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background, requests are served in the meantime
+    warm_up = asyncio.create_task(chain_routes.warm_up(warm_up_chain_names()))
+    yield
+    warm_up.cancel()
+
 
 app = FastAPI(
     title="Simple App to serve chains using LangServe",
     version="0.0.1",
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -21,6 +217,23 @@ app.add_middleware(
 )
 
 
-add_routes(app, simple_rag_chain, path="/simple_chain")
-add_routes(app, rag_chain, path="/complex_configurable_chain")
-add_routes(app, chain, path="/experimental_chain")
+@app.get("/chains")
+async def get_chain_statuses():
+    """Load state and load time of every chain module."""
+    return [asdict(status) for status in chain_statuses()]
+
+
+@app.get("/stage-cache")
+async def get_stage_cache_stats():
+    """Hits, misses and hit rate of every memoized chain stage."""
+    return stage_cache.stats()
+
+
+@app.get("/llm-cache")
+async def get_llm_cache_stats(session_id: Optional[str] = None):
+    """LLM cache hits, misses and hit rate by session and cache mode."""
+    return llm_cache_stats.report(session_id)
+
+
+# Must stay the last route, it takes every path not matched above
+app.mount("", chain_routes)
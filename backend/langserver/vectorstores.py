@@ -0,0 +1,636 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import weakref
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableConfig
+from langchain_core.vectorstores import VectorStoreRetriever
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# Vector stores are saved in a directory per store name
+VECTOR_STORE_DIR = Path(
+    os.getenv(
+        "VECTOR_STORE_DIR", Path(__file__).resolve().parent / ".vectorstores"
+    )
+)
+
+# Embedding attributes that change the vectors, if the model has them
+EMBEDDING_ATTRIBUTES = ("model", "model_name", "dimensions", "size")
+
+INDEX_NAME = "index"
+FINGERPRINT_FILE = "fingerprint.json"
+
+# FAISS index types stores can be built with
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+# Queries embedded and searched together at most
+RETRIEVAL_BATCH_SIZE = int(os.getenv("RETRIEVAL_BATCH_SIZE", "256"))
+# Concurrent queries arriving within this window are searched together
+RETRIEVAL_BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "2"))
+
+# Embedding models whose query embeddings are their document embeddings,
+# so a batch of queries can be embedded in one call
+QUERY_AS_DOCUMENT_EMBEDDINGS = (
+    "OpenAIEmbeddings",
+    "AzureOpenAIEmbeddings",
+    "DeterministicFakeEmbedding",
+    "FakeEmbeddings",
+)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Build-time settings of a FAISS index. `nlist` is the number of IVF
+    clusters, `hnsw_m` the number of HNSW neighbors per node and `pq_m` and
+    `pq_nbits` the number and size of product quantizer codes per vector.
+    Small corpora get fewer clusters and smaller codes, as FAISS can't
+    train more than it has vectors for.
+    """
+
+    type: str = "flat"
+    nlist: int = 1024
+    hnsw_m: int = 32
+    pq_m: int = 16
+    pq_nbits: int = 8
+
+    def __post_init__(self):
+        if self.type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown FAISS index type '{self.type}', "
+                f"expected one of {', '.join(INDEX_TYPES)}"
+            )
+
+    @classmethod
+    def from_env(cls, index_type: Optional[str] = None) -> "IndexSpec":
+        """Settings from the `FAISS_*` environment variables."""
+        return cls(
+            type=index_type or os.getenv("FAISS_INDEX_TYPE", "flat"),
+            nlist=int(os.getenv("FAISS_IVF_NLIST", "1024")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            pq_m=int(os.getenv("FAISS_PQ_M", "16")),
+            pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+        )
+
+    def factory_string(self, count: int, dimension: int) -> str:
+        """`faiss.index_factory` description for `count` vectors."""
+        # FAISS wants at least 39 training vectors per cluster
+        nlist = max(1, min(self.nlist, count // 39))
+        if self.type == "flat" or count < 2:
+            return "Flat"
+        if self.type == "ivf":
+            return f"IVF{nlist},Flat"
+        if self.type == "hnsw":
+            return f"HNSW{self.hnsw_m}"
+        if dimension % self.pq_m:
+            raise ValueError(
+                f"FAISS_PQ_M={self.pq_m} doesn't divide the embedding "
+                f"dimension {dimension}"
+            )
+        nbits = max(1, min(self.pq_nbits, int(math.log2(count))))
+        return f"IVF{nlist},PQ{self.pq_m}x{nbits}"
+
+
+def build_index(vectors: np.ndarray, spec: IndexSpec, metric: int):
+    """Train a FAISS index of type `spec` on `vectors` and add them."""
+    import faiss
+
+    count, dimension = vectors.shape
+    index = faiss.index_factory(
+        dimension, spec.factory_string(count, dimension), metric
+    )
+    if count:
+        index.train(vectors)
+        index.add(vectors)
+    return index
+
+
+def convert_index(store: FAISS, spec: IndexSpec) -> None:
+    """Rebuild the index of `store` as type `spec`, keeping its ids."""
+    # Vectors come back in insertion order, matching `index_to_docstore_id`
+    vectors = store.index.reconstruct_n(0, store.index.ntotal)
+    store.index = build_index(
+        np.ascontiguousarray(vectors, dtype=np.float32),
+        spec,
+        store.index.metric_type,
+    )
+
+
+class _SearchParamsIndex:
+    """FAISS index passing fixed search parameters to every search."""
+
+    def __init__(self, index, params):
+        self._index = index
+        self._params = params
+
+    def search(self, x, k, **kwargs):
+        return self._index.search(x, k, params=self._params, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+def search_parameters(
+    index, *, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+):
+    """FAISS search parameters of the knobs that apply to `index`."""
+    import faiss
+
+    if ef_search is not None and isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index)
+        except RuntimeError:
+            return None
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    return None
+
+
+def embeds_queries_as_documents(embedding: Embeddings) -> bool:
+    """Whether `embed_documents` gives the query embeddings of a model."""
+    embedding = getattr(embedding, "underlying_embeddings", embedding)
+    return type(embedding).__name__ in QUERY_AS_DOCUMENT_EMBEDDINGS
+
+
+def embed_queries(
+    embedding: Embeddings, queries: List[str]
+) -> List[List[float]]:
+    """
+    Embed queries, in one call if the model embeds queries like documents.
+    LangChain has no batch query embedding, so others embed one by one.
+    """
+    if hasattr(embedding, "embed_queries"):
+        return embedding.embed_queries(queries)
+    if embeds_queries_as_documents(embedding):
+        return embedding.embed_documents(queries)
+    return [embedding.embed_query(query) for query in queries]
+
+
+async def aembed_queries(
+    embedding: Embeddings, queries: List[str]
+) -> List[List[float]]:
+    """Async `embed_queries`, embedding one by one concurrently if needed."""
+    if hasattr(embedding, "aembed_queries"):
+        return await embedding.aembed_queries(queries)
+    if embeds_queries_as_documents(embedding):
+        return await embedding.aembed_documents(queries)
+    return list(
+        await asyncio.gather(*(embedding.aembed_query(q) for q in queries))
+    )
+
+
+def search_by_vectors(
+    store: FAISS, vectors: List[List[float]], k: int
+) -> List[List[Document]]:
+    """
+    `store.similarity_search_by_vector` for many query vectors, in a single
+    FAISS search.
+    """
+    import faiss
+
+    # A copy, as normalizing is in place
+    matrix = np.array(vectors, dtype=np.float32)
+    if store._normalize_L2:
+        faiss.normalize_L2(matrix)
+    _, positions = store.index.search(matrix, k)
+    results = []
+    for row in positions:
+        documents = []
+        for position in row:
+            if position == -1:
+                continue
+            docstore_id = store.index_to_docstore_id[position]
+            document = store.docstore.search(docstore_id)
+            if not isinstance(document, Document):
+                raise ValueError(
+                    f"Could not find document for id {docstore_id}, "
+                    f"got {document}"
+                )
+            documents.append(document)
+        results.append(documents)
+    return results
+
+
+class TunableRetriever(VectorStoreRetriever):
+    """
+    Retriever of a FAISS store with search-time knobs that can be set per
+    call, e.g. through `configurable_fields`: `nprobe` is the number of
+    clusters IVF indexes search, `ef_search` the candidate list size of
+    HNSW indexes. Knobs of other index types are ignored, so the same
+    configuration works for stores of any type.
+
+    Similarity searches of many queries are batched: `batch` and `abatch`
+    embed the queries in batched calls and search them with one FAISS
+    search per `RETRIEVAL_BATCH_SIZE` queries, and concurrent `ainvoke`
+    calls, e.g. of a chain's `abatch`, are collected and searched together.
+    """
+
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+    # Documents of the queries `batch` or `abatch` searched already
+    _prefetched: Optional[Dict[str, List[Document]]] = PrivateAttr(
+        default=None
+    )
+
+    def _tuned(self) -> VectorStoreRetriever:
+        params = search_parameters(
+            self.vectorstore.index,
+            nprobe=self.nprobe,
+            ef_search=self.ef_search,
+        )
+        if params is None:
+            return self
+        # A view of the store, the shared index itself stays untouched
+        view = copy.copy(self.vectorstore)
+        view.index = _SearchParamsIndex(self.vectorstore.index, params)
+        return self.model_copy(update={"vectorstore": view})
+
+    def _batchable(self) -> bool:
+        """Whether searches are plain similarity searches of a FAISS store."""
+        return (
+            self.search_type == "similarity"
+            and set(self.search_kwargs) <= {"k"}
+            and isinstance(self.vectorstore, FAISS)
+            and isinstance(self.vectorstore.embedding_function, Embeddings)
+        )
+
+    def _batches(self, queries: Sequence[str]) -> List[List[str]]:
+        unique = list(dict.fromkeys(queries))
+        return [
+            unique[i : i + RETRIEVAL_BATCH_SIZE]
+            for i in range(0, len(unique), RETRIEVAL_BATCH_SIZE)
+        ]
+
+    def _search_batch(self, queries: Sequence[str]) -> List[List[Document]]:
+        """Documents of every query, embedded and searched in batches."""
+        store = self._tuned().vectorstore
+        k = self.search_kwargs.get("k", 4)
+        found: Dict[str, List[Document]] = {}
+        for batch in self._batches(queries):
+            vectors = embed_queries(store.embedding_function, batch)
+            found.update(zip(batch, search_by_vectors(store, vectors, k)))
+        return [list(found[query]) for query in queries]
+
+    async def _asearch_batch(
+        self, queries: Sequence[str]
+    ) -> List[List[Document]]:
+        store = self._tuned().vectorstore
+        k = self.search_kwargs.get("k", 4)
+        found: Dict[str, List[Document]] = {}
+        for batch in self._batches(queries):
+            vectors = await aembed_queries(store.embedding_function, batch)
+            # FAISS releases the GIL while searching
+            results = await asyncio.to_thread(
+                search_by_vectors, store, vectors, k
+            )
+            found.update(zip(batch, results))
+        return [list(found[query]) for query in queries]
+
+    def _should_batch(self, inputs: List[Any], kwargs: Dict) -> bool:
+        return (
+            self._prefetched is None
+            and not kwargs
+            and len(inputs) > 1
+            and all(isinstance(query, str) for query in inputs)
+            and self._batchable()
+        )
+
+    def _with_results(
+        self, queries: Sequence[str], results: List[List[Document]]
+    ) -> "TunableRetriever":
+        retriever = self.model_copy()
+        retriever._prefetched = dict(zip(queries, results))
+        return retriever
+
+    def batch(
+        self,
+        inputs: List[str],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[List[Document]]:
+        if not self._should_batch(inputs, kwargs):
+            return super().batch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        try:
+            results = self._search_batch(inputs)
+        except Exception as e:
+            if return_exceptions:
+                return [e] * len(inputs)
+            raise
+        # Every query still gets its own retriever run, for callbacks
+        return self._with_results(inputs, results).batch(
+            inputs, config, return_exceptions=return_exceptions
+        )
+
+    async def abatch(
+        self,
+        inputs: List[str],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[List[Document]]:
+        if not self._should_batch(inputs, kwargs):
+            return await super().abatch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        try:
+            results = await self._asearch_batch(inputs)
+        except Exception as e:
+            if return_exceptions:
+                return [e] * len(inputs)
+            raise
+        return await self._with_results(inputs, results).abatch(
+            inputs, config, return_exceptions=return_exceptions
+        )
+
+    def _batcher(self) -> "_QueryBatcher":
+        key = (
+            id(asyncio.get_running_loop()),
+            self.search_kwargs.get("k", 4),
+            self.nprobe,
+            self.ef_search,
+        )
+        batchers = _batchers.setdefault(self.vectorstore, {})
+        return batchers.setdefault(key, _QueryBatcher())
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        **kwargs: Any,
+    ) -> List[Document]:
+        if self._prefetched is not None and query in self._prefetched:
+            return list(self._prefetched[query])
+        return VectorStoreRetriever._get_relevant_documents(
+            self._tuned(), query, run_manager=run_manager, **kwargs
+        )
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        **kwargs: Any,
+    ) -> List[Document]:
+        if self._prefetched is not None and query in self._prefetched:
+            return list(self._prefetched[query])
+        if RETRIEVAL_BATCH_WINDOW_MS > 0 and not kwargs and self._batchable():
+            return await self._batcher().search(self, query)
+        return await VectorStoreRetriever._aget_relevant_documents(
+            self._tuned(), query, run_manager=run_manager, **kwargs
+        )
+
+
+class _QueryBatcher:
+    """
+    Collects concurrent queries of equally configured retrievers of a store
+    and searches them together, once `RETRIEVAL_BATCH_WINDOW_MS` passed
+    since the first one or `RETRIEVAL_BATCH_SIZE` queries are waiting.
+    """
+
+    def __init__(self):
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._retriever: Optional[TunableRetriever] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._searches: set = set()
+
+    async def search(
+        self, retriever: TunableRetriever, query: str
+    ) -> List[Document]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        self._retriever = retriever
+        if len(self._pending) >= RETRIEVAL_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                RETRIEVAL_BATCH_WINDOW_MS / 1000, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        # Not kept beyond the flush, so the store can be garbage collected
+        retriever, self._retriever = self._retriever, None
+        if pending:
+            search = asyncio.create_task(self._run(retriever, pending))
+            # Referenced until done, the loop only keeps weak references
+            self._searches.add(search)
+            search.add_done_callback(self._searches.discard)
+
+    async def _run(
+        self,
+        retriever: TunableRetriever,
+        pending: List[Tuple[str, asyncio.Future]],
+    ) -> None:
+        try:
+            results = await retriever._asearch_batch([q for q, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), documents in zip(pending, results):
+            # Callers may have been cancelled in the meantime
+            if not future.done():
+                future.set_result(documents)
+
+
+# Query batchers of every store by event loop and search settings
+_batchers: "weakref.WeakKeyDictionary[FAISS, Dict[tuple, _QueryBatcher]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def tunable_retriever(store: FAISS, **kwargs: Any) -> TunableRetriever:
+    """Like `store.as_retriever(**kwargs)`, returning a `TunableRetriever`."""
+    tags = kwargs.pop("tags", None) or [] + store._get_retriever_tags()
+    return TunableRetriever(vectorstore=store, tags=tags, **kwargs)
+
+
+def embedding_identity(embedding: Embeddings) -> Dict[str, Any]:
+    """Describe an embedding model by its class and vector settings."""
+    # Caching wrappers produce the vectors of the model they wrap
+    embedding = getattr(embedding, "underlying_embeddings", embedding)
+    identity: Dict[str, Any] = {"class": type(embedding).__name__}
+    for attribute in EMBEDDING_ATTRIBUTES:
+        value = getattr(embedding, attribute, None)
+        if value is not None:
+            identity[attribute] = value
+    return identity
+
+
+def fingerprint(
+    documents: List[Document], embedding: Embeddings, index: IndexSpec
+) -> str:
+    """Hash the documents, embedding model and index a store is built from."""
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [embedding_identity(embedding), asdict(index)], sort_keys=True
+        ).encode()
+    )
+    for document in documents:
+        digest.update(
+            json.dumps(
+                [document.page_content, document.metadata],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        )
+    return digest.hexdigest()
+
+
+def load_faiss(path: Path, embedding: Embeddings, *, mmap: bool) -> FAISS:
+    """
+    Load a store saved with `FAISS.save_local`. With `mmap`, the index is
+    memory-mapped read-only instead of read into memory, where the index
+    type supports it.
+    """
+    import faiss
+
+    index_path = str(path / f"{INDEX_NAME}.faiss")
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(
+                index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+        except RuntimeError as e:
+            logger.info(f"Can't memory-map '{index_path}', reading it: {e}")
+    if index is None:
+        index = faiss.read_index(index_path)
+
+    # Written by `save_faiss` below, not an untrusted pickle
+    with open(path / f"{INDEX_NAME}.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embedding, index, docstore, index_to_docstore_id)
+
+
+def save_faiss(store: FAISS, path: Path, files: Dict[str, Any]) -> None:
+    """
+    Save a store together with JSON `files` describing it, e.g. its
+    fingerprint, replacing the directory at once.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    try:
+        store.save_local(str(staging), INDEX_NAME)
+        for file_name, content in files.items():
+            (staging / file_name).write_text(json.dumps(content))
+        if path.exists():
+            shutil.rmtree(path)
+        staging.rename(path)
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging)
+
+
+def read_fingerprint(path: Path) -> Optional[str]:
+    """Fingerprint of a saved store, if there is a complete one."""
+    try:
+        saved = json.loads((path / FINGERPRINT_FILE).read_text())
+        return saved["fingerprint"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_or_build_faiss(
+    name: str,
+    documents: List[Document],
+    embedding: Embeddings,
+    *,
+    index: Optional[IndexSpec] = None,
+    mmap: bool = True,
+) -> FAISS:
+    """
+    Load the FAISS store `name` from disk if it was built from the same
+    documents, embedding model and index settings, otherwise embed the
+    documents, build an index of type `index` (by default configured with
+    `FAISS_INDEX_TYPE`) and save the new store for the next start.
+    """
+    index = index or IndexSpec.from_env()
+    path = VECTOR_STORE_DIR / name
+    store_fingerprint = fingerprint(documents, embedding, index)
+
+    if read_fingerprint(path) == store_fingerprint:
+        started_at = time.perf_counter()
+        try:
+            store = load_faiss(path, embedding, mmap=mmap)
+        except (OSError, RuntimeError, pickle.UnpicklingError) as e:
+            logger.warning(f"Failed to load vector store '{name}': {e}")
+        else:
+            logger.info(
+                f"Loaded vector store '{name}' in "
+                f"{time.perf_counter() - started_at:.3f}s"
+            )
+            return store
+
+    started_at = time.perf_counter()
+    store = FAISS.from_documents(documents, embedding=embedding)
+    if index.type != "flat":
+        convert_index(store, index)
+    logger.info(
+        f"Embedded {len(documents)} documents for vector store '{name}' in "
+        f"{time.perf_counter() - started_at:.3f}s"
+    )
+    try:
+        save_faiss(
+            store, path, {FINGERPRINT_FILE: {"fingerprint": store_fingerprint}}
+        )
+    except OSError as e:
+        logger.warning(f"Failed to save vector store '{name}': {e}")
+    return store
+
+
+def load_vector_store(
+    name: str, embedding: Embeddings, *, mmap: bool = True
+) -> FAISS:
+    """
+    Load the FAISS store `name` written by `langserver.ingest`, e.g. for a
+    chain's retriever. Fails if it was embedded with another model.
+    """
+    from langserver.ingest import read_manifest
+
+    path = VECTOR_STORE_DIR / name
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No ingested vector store '{name}' in {path}")
+    if manifest["embedding"] != embedding_identity(embedding):
+        raise ValueError(
+            f"Vector store '{name}' was embedded with "
+            f"{manifest['embedding']}, not {embedding_identity(embedding)}"
+        )
+    return load_faiss(path, embedding, mmap=mmap)
@@ -0,0 +1,140 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import concurrency
+from app.core.concurrency import AdaptiveLimiter, CircuitBreaker, UpstreamGuard
+from app.models.chain import Chain
+from app.services import chain as chain_module
+from app.services.chain import ChainService
+from app.services.exceptions import ChainError, ChainUnavailableError
+from app.services.executor import (
+    ChainExecutor,
+    RetryableChainError,
+    RunMetrics,
+)
+
+
+class ScriptedExecutor(ChainExecutor):
+    """Raises the scripted errors in turn, then answers every input."""
+
+    def __init__(self, *errors: BaseException):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def batch(self, *, chain_name, inputs, config_values, metadata=None):
+        self.calls += 1
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, asyncio.CancelledError):
+                await asyncio.sleep(3600)
+            raise error
+        return [(f"answer to {i}", RunMetrics()) for i in inputs]
+
+    async def stream_events(self, **kwargs):
+        # Nothing to stream, `yield` only makes this an async generator
+        return
+        yield
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(concurrency, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def guard(monkeypatch, clock):
+    guard = UpstreamGuard(
+        limiter=AdaptiveLimiter(initial=4, maximum=4),
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30),
+    )
+    monkeypatch.setattr(chain_module, "get_upstream_guard", lambda _: guard)
+    monkeypatch.setattr(chain_module, "LANGSERVE_MAX_RETRIES", 0)
+    return guard
+
+
+def invoke(service: ChainService) -> list:
+    return asyncio.run(
+        service._invoke_batch(
+            chain_name="chain", inputs=["q"], config_values=None
+        )
+    )
+
+
+def open_breaker(service: ChainService) -> None:
+    with pytest.raises(RetryableChainError):
+        invoke(service)
+    with pytest.raises(ChainUnavailableError):
+        invoke(service)
+
+
+@pytest.mark.parametrize(
+    "probe_error",
+    [
+        ChainError("Chain invocation failed: 422"),
+        RetryableChainError("Chain invocation failed: 429", overloaded=True),
+        RuntimeError("unexpected"),
+    ],
+)
+def test_failed_probe_without_upstream_down_lets_breaker_recover(
+    guard, clock, probe_error
+):
+    executor = ScriptedExecutor(
+        RetryableChainError("connection refused", upstream_down=True),
+        probe_error,
+    )
+    service = ChainService(Chain, db=None, executor=executor)
+    open_breaker(service)
+
+    clock.now += 30
+    with pytest.raises(type(probe_error)):
+        invoke(service)
+
+    assert invoke(service) == [("answer to q", RunMetrics())]
+    assert not guard.breaker.is_open
+
+
+def test_cancelled_probe_lets_breaker_recover(guard, clock):
+    executor = ScriptedExecutor(
+        RetryableChainError("connection refused", upstream_down=True),
+        asyncio.CancelledError(),
+    )
+    service = ChainService(Chain, db=None, executor=executor)
+    open_breaker(service)
+
+    async def cancel_probe() -> None:
+        clock.now += 30
+        probe = asyncio.create_task(
+            service._invoke_batch(
+                chain_name="chain", inputs=["q"], config_values=None
+            )
+        )
+        while executor.calls < 2:
+            await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert invoke(service) == [("answer to q", RunMetrics())]
+    assert not guard.breaker.is_open
+
+
+def test_failed_probe_with_upstream_down_reopens_breaker(guard, clock):
+    executor = ScriptedExecutor(
+        RetryableChainError("connection refused", upstream_down=True),
+        RetryableChainError("connection refused", upstream_down=True),
+    )
+    service = ChainService(Chain, db=None, executor=executor)
+    open_breaker(service)
+
+    clock.now += 30
+    with pytest.raises(RetryableChainError):
+        invoke(service)
+    with pytest.raises(ChainUnavailableError):
+        invoke(service)
+    assert executor.calls == 2
@@ -0,0 +1,26 @@
+import pytest
+
+from app.services.exceptions import ChainError
+from app.services.executor import (
+    ChainEndpointNotFoundError,
+    ChainInputError,
+    LangServeExecutor,
+    RetryableChainError,
+)
+
+
+@pytest.mark.parametrize(
+    "status, detail, expected",
+    [
+        (404, "Not Found", ChainEndpointNotFoundError),
+        (413, "Payload too large", ChainInputError),
+        (422, "Validation error", ChainInputError),
+        (500, "BadRequestError: context_length_exceeded", ChainInputError),
+        (500, "RateLimitError", RetryableChainError),
+        (401, "Unauthorized", ChainError),
+    ],
+)
+def test_classify_failure(status, detail, expected):
+    error = LangServeExecutor()._classify_failure(status, detail, None)
+    assert type(error) is expected
+    assert isinstance(error, ChainError)
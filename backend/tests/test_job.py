@@ -0,0 +1,19 @@
+import asyncio
+from uuid import uuid4
+
+from app.services.job import JobManager
+
+
+def test_submissions_differing_in_use_cache_are_not_merged():
+    async def submit_all():
+        jobs = JobManager()
+        ids = dict(session_id=uuid4(), chain_id=uuid4(), config_id=uuid4())
+        cached = jobs.submit(**ids, options={"use_cache": True})
+        uncached = jobs.submit(**ids, options={"use_cache": False})
+        duplicate = jobs.submit(**ids, options={})
+        return cached, uncached, duplicate
+
+    cached, uncached, duplicate = asyncio.run(submit_all())
+    assert uncached is not cached
+    # `use_cache` defaults to on
+    assert duplicate is cached
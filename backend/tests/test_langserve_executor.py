@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langserve import add_routes
+
+from app.services.executor import ChainInputError, LangServeExecutor
+from langserver.backends import FakeChatModel
+from langserver.server import add_measured_batch_route
+
+
+def reject(question: str) -> str:
+    raise ValueError(f"Can't answer '{question}'")
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    app = FastAPI()
+    chains = {
+        "chain": PromptTemplate.from_template("Answer: {question}")
+        | FakeChatModel(model_name="fake-chat", latency_ms=5)
+        | StrOutputParser(),
+        "failing_chain": RunnableLambda(reject),
+    }
+    for name, runnable in chains.items():
+        add_routes(app, runnable, path=f"/{name}")
+        add_measured_batch_route(app, runnable, f"/{name}")
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+def test_batch_returns_metrics_of_every_run(base_url):
+    results = asyncio.run(
+        LangServeExecutor(base_url=base_url).batch(
+            chain_name="chain",
+            inputs=["What is RAG?", "What is LCEL?"],
+            config_values=None,
+        )
+    )
+    assert len(results) == 2
+    for output, metrics in results:
+        assert isinstance(output, str) and output
+        assert metrics.latency_ms >= 5
+        assert metrics.prompt_tokens > 0
+        assert metrics.completion_tokens > 0
+        assert metrics.model_name == "fake-chat"
+
+
+def test_batch_reports_rejected_inputs(base_url):
+    with pytest.raises(ChainInputError):
+        asyncio.run(
+            LangServeExecutor(base_url=base_url).batch(
+                chain_name="failing_chain",
+                inputs=["What is RAG?"],
+                config_values=None,
+            )
+        )
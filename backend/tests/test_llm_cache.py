@@ -0,0 +1,47 @@
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage
+
+from langserver import llm_cache
+from langserver.backends import FakeChatModel
+from langserver.llm_cache import (
+    ExactLLMCache,
+    Prompt,
+    ResponseStore,
+    SemanticLLMCache,
+    with_llm_cache,
+)
+
+
+def semantic_cache(path) -> SemanticLLMCache:
+    # Every worker process opens its own store on the shared file
+    store = ResponseStore(path, ttl_seconds=0, max_entries=100)
+    return SemanticLLMCache(store, DeterministicFakeEmbedding(size=8), 0.99)
+
+
+def test_semantic_cache_sees_responses_of_other_workers(tmp_path):
+    path = tmp_path / "llm_cache.sqlite"
+    worker, other_worker = semantic_cache(path), semantic_cache(path)
+    asked = Prompt(messages="[1]", text="What is RAG?", llm_string="model")
+    assert worker.lookup(asked) is None
+
+    # Same text in other messages, found by similarity only
+    answered = Prompt(messages="[2]", text="What is RAG?", llm_string="model")
+    other_worker.update(answered, AIMessage(content="Retrieval"))
+    assert worker.lookup(asked).content == "Retrieval"
+
+
+def test_call_kwargs_are_part_of_the_key(tmp_path, monkeypatch):
+    store = ResponseStore(tmp_path / "llm_cache.sqlite", 0, 100)
+    monkeypatch.setattr(llm_cache, "_caches", {"exact": ExactLLMCache(store)})
+    model = FakeChatModel(model_name="fake-chat", latency_ms=0)
+    config = {"configurable": {"llm_cache": "exact"}}
+
+    def key(runnable, **kwargs) -> str:
+        _, prompt, _ = runnable._cache("question", config, kwargs)
+        return prompt.key
+
+    plain = with_llm_cache(model)
+    assert key(plain) != key(plain, stop=["\n"])
+    bound = with_llm_cache(model.bind(stop=["\n"]))
+    assert key(bound) == key(plain, stop=["\n"])
+    assert key(bound) != key(with_llm_cache(model.bind(stop=["."])))
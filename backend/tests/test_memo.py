@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+from langchain_core.runnables import RunnableLambda
+
+from app.services.chain import ChainService
+from langserver.memo import BYPASS_METADATA_KEY, memoize
+
+
+def counting_stage():
+    calls = []
+
+    def reformulate(question: str) -> str:
+        calls.append(question)
+        return f"{question} ({len(calls)})"
+
+    return memoize(RunnableLambda(reformulate), "reformulation"), calls
+
+
+def test_memoized_stage_reuses_output():
+    stage, calls = counting_stage()
+    assert stage.invoke("q") == stage.invoke("q") == "q (1)"
+    assert len(calls) == 1
+
+
+def test_bypass_runs_stage_afresh():
+    stage, calls = counting_stage()
+    stage.invoke("q")
+    config = {"metadata": {BYPASS_METADATA_KEY: True}}
+    assert stage.invoke("q", config) == "q (2)"
+    assert asyncio.run(stage.ainvoke("q", config)) == "q (3)"
+    # Bypassed runs don't replace the memoized output
+    assert stage.invoke("q") == "q (1)"
+
+
+def test_main_app_bypasses_stages_without_use_cache():
+    metadata = ChainService._run_metadata(None, use_cache=False)
+    assert metadata == {BYPASS_METADATA_KEY: True}
+    assert ChainService._run_metadata(None) == {}
+
+
+def test_concurrent_calls_on_different_event_loops():
+    # The main app and LangServe threads share chains run in process
+    started = threading.Barrier(2)
+    calls = []
+
+    async def retrieve(question: str) -> str:
+        calls.append(question)
+        await asyncio.sleep(0.05)
+        return f"documents for {question}"
+
+    stage = memoize(RunnableLambda(retrieve), "retrieval")
+    outputs = []
+
+    def run_on_own_loop() -> None:
+        async def call() -> str:
+            started.wait()
+            return await stage.ainvoke("q")
+
+        outputs.append(asyncio.run(call()))
+
+    threads = [threading.Thread(target=run_on_own_loop) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert outputs == ["documents for q"] * 2